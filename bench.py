@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+海绵宝宝性能基准
+在 Qt 的 offscreen 平台上运行，无需显示器：
+
+    python bench.py paint --save-baseline baseline.json
+    python bench.py paint --baseline baseline.json --threshold 0.2
+    python bench.py pets --counts 1 10 50 200
+    python bench.py startup --runs 5
+    python bench.py save --rounds 2000
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import statistics
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# 先导入 pet_clock，startup 基准才能把 PyQt 的导入时间算进去
+import pet_clock
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtCore import Qt, QTimer
+
+# 基准测试里轮换的动画状态
+STATES = pet_clock.ANIMATION_STATES
+
+# 各状态下同时打开的特效
+STATE_EFFECTS = {
+    'hungry': 'show_question',
+    'dirty': 'show_dirt',
+    'happy': 'show_hearts',
+    'playing': 'show_hearts',
+    'eating': 'show_food',
+    'washing': 'show_water',
+}
+
+# 与基线比较时各指标的绝对容差：基线接近 0 的指标只按比例比较会被噪声误报，
+# 几十微秒的绘制耗时也会因调度抖动差出几微秒
+METRIC_SLACK = {'median_us': 5.0, 'alloc_kb': 0.5, 'blocks': 1.0}
+
+
+def get_app():
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def make_pets(count, scheduler, saver, save_dir, shared_cache):
+    """创建 count 只宠物，存档放在临时目录"""
+    cache = pet_clock.PoseCache() if shared_cache else None
+    pets = []
+    for i in range(count):
+        data = pet_clock.PetData(os.path.join(save_dir, f'pet_{i}.sav'), saver)
+        pets.append(pet_clock.SpongeBobPet(data, scheduler, pose_cache=cache))
+    return pets
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class PaintMeasurement:
+    """一个用例的绘制测量：每帧先调用 step() 推进状态，再把控件画到离屏图像上，只对绘制计时
+
+    timing() 预热后按轮次计时，每轮 frames 帧；median_us 取各轮中位数的最小值。
+    allocations() 在 tracemalloc 下再画 frames 帧，统计每帧绘制期间 Python
+    堆的峰值增量（KB），以及回收循环垃圾后仍未释放的内存块数；
+    PaintResources 的缓存未命中单独记为 cache_new。
+    """
+    def __init__(self, widget, step):
+        self.widget = widget
+        self.step = step
+        self.image = QImage(widget.size(), QImage.Format_ARGB32_Premultiplied)
+        self.frame = 0
+        self.times = []
+        self.medians = []
+        self.cache_new = []
+        
+    def paint(self):
+        """推进并绘制一帧，返回绘制耗时（微秒）和本帧新建的绘制对象数"""
+        self.step(self.frame)
+        self.frame += 1
+        self.image.fill(Qt.transparent)
+        before = pet_clock.paint_cache.allocations
+        painter = QPainter(self.image)
+        start = time.perf_counter()
+        self.widget.render(painter)
+        elapsed = time.perf_counter() - start
+        painter.end()
+        return elapsed * 1e6, pet_clock.paint_cache.allocations - before
+        
+    def warm_up(self, frames):
+        for _ in range(frames):
+            self.paint()
+            
+    def time_round(self, frames):
+        times = []
+        for _ in range(frames):
+            elapsed, created = self.paint()
+            times.append(elapsed)
+            self.cache_new.append(created)
+        self.times += times
+        self.medians.append(statistics.median(times))
+        
+    def timing(self):
+        return {
+            'median_us': min(self.medians),
+            'mean_us': sum(self.times) / len(self.times),
+            'p99_us': percentile(self.times, 99),
+            'cache_new': sum(self.cache_new) / len(self.cache_new),
+        }
+        
+    def allocations(self, frames):
+        # 分配单独跑，tracemalloc 的开销不计入耗时
+        alloc_kb = []
+        blocks = []
+        tracemalloc.start()
+        for _ in range(frames):
+            self.step(self.frame)
+            self.frame += 1
+            self.image.fill(Qt.transparent)
+            painter = QPainter(self.image)
+            gc.collect()
+            before_blocks = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            self.widget.render(painter)
+            peak = tracemalloc.get_traced_memory()[1]
+            painter.end()
+            gc.collect()
+            blocks.append(sys.getallocatedblocks() - before_blocks)
+            alloc_kb.append((peak - before) / 1024)
+        tracemalloc.stop()
+        return {
+            'alloc_kb': sum(alloc_kb) / len(alloc_kb),
+            'blocks': sum(blocks) / len(blocks),
+        }
+
+
+def paint_cases(scheduler, saver, save_dir):
+    """(名字, 控件, 每帧推进函数) 列表：宠物每个动画状态、时钟各模式、状态面板"""
+    data = pet_clock.PetData(os.path.join(save_dir, 'paint.sav'), saver)
+    cases = []
+    
+    for state in STATES:
+        pet = pet_clock.SpongeBobPet(data, scheduler)
+        pet.state = state
+        if state in STATE_EFFECTS:
+            setattr(pet, STATE_EFFECTS[state], True)
+        if state == 'jump':
+            pet.is_jumping = True
+            
+        def step(frame, pet=pet):
+            if pet.state == 'jump' and not pet.is_jumping:
+                pet.is_jumping = True
+                pet.jump_velocity = -pet_clock.JUMP_SPEED
+            pet.animate()
+            pet.move_pet(pet_clock.FRAME_INTERVAL_MS)
+            if frame % 2 == 0:
+                pet.update_effects()
+                pet.sync_window()
+        cases.append((f'pet.{state}', pet, step))
+        
+    clock = pet_clock.DesktopClock(scheduler)
+    cases.append(('clock.normal', clock, lambda frame: clock.update_display()))
+    # 省电模式：按 20 帧一秒翻页
+    for name, glow_frames in (('clock.lite', pet_clock.CLOCK_GLOW_FRAMES), ('clock.lite_noglow', 0)):
+        lite = pet_clock.DesktopClock(scheduler, lite=True, glow_frames=glow_frames)
+        
+        def tick(frame, lite=lite):
+            if lite.glow_frames:
+                lite.next_glow_frame()
+            if frame % 20 == 0:
+                lite.on_second()
+        cases.append((name, lite, tick))
+    
+    # 状态面板用自己的数据：改数值会改变心情，不能让宠物用例跟着换状态
+    status_data = pet_clock.PetData(os.path.join(save_dir, 'status.sav'), saver)
+    status = pet_clock.StatusPanel(status_data, scheduler)
+    cases.append(('status.static', status, lambda frame: None))
+    
+    def change(frame):
+        status_data.set_stats(hunger=frame % 101)
+    cases.append(('status.changing', status, change))
+    return cases
+
+
+def save_baseline(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n基线已保存到 {path}")
+
+
+def check_baseline(results, path, threshold, metrics):
+    """与基线比较，有指标超过 threshold 时打印并返回 1"""
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    failures = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in metrics:
+            if metric not in old:
+                continue
+            limit = old[metric] * (1 + threshold) + METRIC_SLACK.get(metric, 0)
+            if result[metric] > limit:
+                failures.append(f"{name} {metric}: {old[metric]:.1f} -> {result[metric]:.1f}")
+    if failures:
+        print(f"\n超过基线 {threshold:.0%} 的用例：")
+        for line in failures:
+            print("  " + line)
+        return 1
+    print(f"\n所有用例都在基线 {threshold:.0%} 以内")
+    return 0
+
+
+def paint_measurements(args, scheduler, saver, save_dir):
+    return [(name, PaintMeasurement(widget, step))
+            for name, widget, step in paint_cases(scheduler, saver, save_dir)
+            if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+
+
+def paint_probe(args):
+    """子进程里计时各用例，输出 {用例: 耗时} 的 JSON
+
+    各用例按轮次交替计时，持续一段时间的后台负载或降频只拖慢各用例的个别轮次。
+    """
+    app = get_app()  # 保持引用，避免 QApplication 被回收
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as save_dir:
+        cases = paint_measurements(args, pet_clock.FrameScheduler(), pet_clock.NullSaver(), save_dir)
+        for name, case in cases:
+            case.warm_up(args.warmup)
+        for _ in range(args.rounds):
+            for name, case in cases:
+                case.time_round(args.frames)
+        print(json.dumps({name: case.timing() for name, case in cases}))
+    return 0
+
+
+def bench_paint(args):
+    """各控件各状态的绘制耗时（中位数、平均、P99）和绘制对象分配，可保存基线并检查回退
+
+    同一份代码在不同进程里可能整体快慢差出一半（内存布局、所在 CPU），所以
+    耗时在 --processes 个新进程里分别测，median_us 取各进程中最快的一个，
+    平均和 P99 取各进程的中位数，只作参考；分配与进程无关，在本进程测一次。
+    """
+    app = get_app()  # 保持引用，避免 QApplication 被回收
+    probe_args = ['--frames', str(args.frames), '--rounds', str(args.rounds),
+                  '--warmup', str(args.warmup), '--seed', str(args.seed)]
+    if args.only:
+        probe_args += ['--only', *args.only]
+    runs = []
+    for _ in range(args.processes):
+        command = [sys.executable, os.path.abspath(__file__), 'paint-probe', *probe_args]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+        
+    random.seed(args.seed)
+    results = {}
+    print(f"{'用例':<20} {'中位数(us)':>10} {'平均(us)':>10} {'P99(us)':>10} {'分配KB/帧':>10} {'留存块/帧':>10} "
+          f"{'缓存新建/帧':>10}")
+    with tempfile.TemporaryDirectory() as save_dir:
+        for name, case in paint_measurements(args, pet_clock.FrameScheduler(), pet_clock.NullSaver(), save_dir):
+            # 和计时进程画到同一帧再统计分配，缓存都已填满
+            case.warm_up(args.warmup + args.rounds * args.frames)
+            result = results[name] = {
+                'median_us': min(run[name]['median_us'] for run in runs),
+                'mean_us': statistics.median(run[name]['mean_us'] for run in runs),
+                'p99_us': statistics.median(run[name]['p99_us'] for run in runs),
+                **case.allocations(args.frames),
+                'cache_new': statistics.median(run[name]['cache_new'] for run in runs),
+            }
+            print(f"{name:<20} {result['median_us']:>10.1f} {result['mean_us']:>10.1f} {result['p99_us']:>10.1f} "
+                  f"{result['alloc_kb']:>10.2f} {result['blocks']:>10.2f} {result['cache_new']:>10.2f}")
+            
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.baseline:
+        return check_baseline(results, args.baseline, args.threshold,
+                              ('median_us', 'alloc_kb', 'blocks'))
+    return 0
+
+
+def bench_pets(args):
+    """N 只宠物的单帧开销：模拟 + 绘制，比较共用与独立渲染缓存"""
+    app = get_app()  # 保持引用，避免 QApplication 被回收
+    rng = random.Random(args.seed)
+    print(f"{'宠物数':>6} {'缓存':>4} {'每帧(ms)':>10} {'每只(us)':>10} {'命中率':>7}")
+    with tempfile.TemporaryDirectory() as save_dir:
+        saver = pet_clock.SaveWorker()
+        scheduler = pet_clock.FrameScheduler()
+        for count in args.counts:
+            for shared in (False, True):
+                random.seed(args.seed)
+                pets = make_pets(count, scheduler, saver, save_dir, shared)
+                image = QImage(pets[0].size(), QImage.Format_ARGB32_Premultiplied)
+                start = time.perf_counter()
+                for frame in range(args.frames):
+                    if frame % 60 == 0:
+                        for pet in pets:
+                            pet.state = rng.choice(STATES)
+                    for pet in pets:
+                        pet.animate()
+                        pet.update_effects()
+                        image.fill(Qt.transparent)
+                        painter = QPainter(image)
+                        pet.render(painter)
+                        painter.end()
+                elapsed = time.perf_counter() - start
+                per_frame = elapsed / args.frames
+                caches = {id(pet.pose_cache): pet.pose_cache for pet in pets}.values()
+                hits = sum(cache.hits for cache in caches)
+                misses = sum(cache.misses for cache in caches)
+                print(f"{count:>6} {'共用' if shared else '独立':>4} {per_frame * 1000:>10.2f} "
+                      f"{per_frame / count * 1e6:>10.1f} {hits / max(1, hits + misses):>7.1%}")
+                for pet in pets:
+                    for job in pet.jobs:
+                        scheduler.remove(job)
+                    pet.deleteLater()
+        saver.flush()
+    return 0
+
+
+def startup_probe(args):
+    """子进程里启动完整应用，等其余组件创建完后输出各阶段耗时（毫秒）"""
+    with tempfile.TemporaryDirectory() as save_dir:
+        pet_clock.SAVE_FILE = os.path.join(save_dir, 'pet_data.sav')
+        start = time.perf_counter()
+        # 不挂烘焙图集，免得每次测量都在后台烘焙
+        options = pet_clock.parse_args([*args.app_args, '--no-sprite-atlas'])
+        app = pet_clock.PetClockApp(options)
+        times = pet_clock.startup_times
+        
+        def poll():
+            if 'ready' not in times:
+                return
+            print(json.dumps({
+                'spawn_to_first_frame_ms': (time.time() - args.spawned) * 1000
+                                           - (time.perf_counter() - times['first_frame']) * 1000,
+                'import_ms': (times['import_end'] - times['import_start']) * 1000,
+                'construct_ms': (times['app_created'] - start) * 1000,
+                'first_frame_ms': (times['first_frame'] - start) * 1000,
+                'ready_ms': (times['ready'] - start) * 1000,
+            }))
+            app.quit_app()
+        timer = QTimer()
+        timer.timeout.connect(poll)
+        timer.start(5)
+        app.run()
+        app.saver.flush()
+    return 0
+
+
+def bench_startup(args):
+    """冷启动耗时：每次新开一个进程，取各阶段的中位数"""
+    runs = []
+    for _ in range(args.runs):
+        command = [sys.executable, os.path.abspath(__file__), 'startup-probe',
+                   '--spawned', repr(time.time()), '--', *args.app_args]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+        
+    results = {'startup': {key: statistics.median(run[key] for run in runs) for key in runs[0]}}
+    print(f"{'阶段':<26} {'中位数(ms)':>10}")
+    for key, value in results['startup'].items():
+        print(f"{key:<26} {value:>10.1f}")
+        
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.baseline:
+        return check_baseline(results, args.baseline, args.threshold,
+                              ('spawn_to_first_frame_ms', 'first_frame_ms'))
+    return 0
+
+
+def time_per_call(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def bench_save(args):
+    """存档：二进制格式与原来的 JSON 格式的编码、解码、落盘耗时和文件大小"""
+    with tempfile.TemporaryDirectory() as save_dir:
+        data = pet_clock.PetData(os.path.join(save_dir, 'seed.sav'), pet_clock.NullSaver()).to_dict()
+        json_path = os.path.join(save_dir, 'pet_data.json')
+        binary_path = os.path.join(save_dir, 'pet_data.sav')
+        
+        def json_encode():
+            return json.dumps(data, ensure_ascii=False, indent=2)
+            
+        def json_decode():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+                
+        pet_clock.write_json_atomic(json_path, data)
+        pet_clock.write_save(binary_path, data)
+        cases = [
+            ('json', json_encode, json_decode,
+             lambda: pet_clock.write_json_atomic(json_path, data), json_path),
+            ('binary', lambda: pet_clock.encode_save(data), lambda: pet_clock.read_save(binary_path),
+             lambda: pet_clock.write_save(binary_path, data), binary_path),
+        ]
+        print(f"{'格式':<8} {'编码(us)':>10} {'读取(us)':>10} {'落盘(us)':>10} {'大小(B)':>8}")
+        for name, encode, load, write, path in cases:
+            print(f"{name:<8} {time_per_call(encode, args.rounds):>10.1f} "
+                  f"{time_per_call(load, args.rounds):>10.1f} "
+                  f"{time_per_call(write, args.writes):>10.1f} {os.path.getsize(path):>8}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="海绵宝宝性能基准")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    paint = sub.add_parser('paint', help="各控件各状态的绘制耗时")
+    paint_probe_parser = sub.add_parser('paint-probe')
+    for command in (paint, paint_probe_parser):
+        command.add_argument('--frames', type=int, default=100, help="每个用例每轮计时的帧数")
+        command.add_argument('--rounds', type=int, default=10, help="计时轮数，取各轮中位数的最小值")
+        command.add_argument('--warmup', type=int, default=50)
+        command.add_argument('--only', nargs='+', help="只跑名字以这些前缀开头的用例，如 pet clock.lite")
+        command.add_argument('--seed', type=int, default=0)
+    paint.add_argument('--processes', type=int, default=5, help="计时的进程数，取最快的一个")
+    paint.add_argument('--save-baseline', metavar='FILE', help="把结果保存为基线")
+    paint.add_argument('--baseline', metavar='FILE', help="与基线比较，超过阈值时返回 1")
+    paint.add_argument('--threshold', type=float, default=0.2, help="允许的回退比例")
+    paint.set_defaults(func=bench_paint)
+    paint_probe_parser.set_defaults(func=paint_probe)
+
+    pets = sub.add_parser('pets', help="多宠物模式下每只宠物的单帧开销")
+    pets.add_argument('--counts', type=int, nargs='+', default=[1, 10, 50, 200])
+    pets.add_argument('--frames', type=int, default=120)
+    pets.add_argument('--seed', type=int, default=0)
+    pets.set_defaults(func=bench_pets)
+
+    startup = sub.add_parser('startup', help="从启动进程到第一帧的冷启动耗时")
+    startup.add_argument('--runs', type=int, default=5)
+    startup.add_argument('--save-baseline', metavar='FILE', help="把结果保存为基线")
+    startup.add_argument('--baseline', metavar='FILE', help="与基线比较，超过阈值时返回 1")
+    startup.add_argument('--threshold', type=float, default=0.2, help="允许的回退比例")
+    startup.add_argument('app_args', nargs='*', help="传给应用的参数（写在 -- 之后），如 -- --overlay")
+    startup.set_defaults(func=bench_startup)
+
+    save = sub.add_parser('save', help="二进制存档与 JSON 存档的读写耗时")
+    save.add_argument('--rounds', type=int, default=2000, help="编码和读取的次数")
+    save.add_argument('--writes', type=int, default=50, help="落盘（含 fsync）的次数")
+    save.set_defaults(func=bench_save)
+
+    probe = sub.add_parser('startup-probe')
+    probe.add_argument('--spawned', type=float, required=True)
+    probe.add_argument('app_args', nargs='*')
+    probe.set_defaults(func=startup_probe)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,219 +7,1878 @@
 
 import sys
 import os
+import argparse
 import json
 import random
 import math
+import time
+import threading
+import functools
+import hashlib
+import heapq
+import mmap
+import struct
+import zlib
+from array import array
+from itertools import repeat
+from collections import OrderedDict, namedtuple, deque
 from datetime import datetime
-from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QSystemTrayIcon, 
-                             QMenu, QAction, QDesktopWidget, QProgressBar,
-                             QVBoxLayout, QHBoxLayout, QPushButton, QFrame)
-from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, pyqtSignal
-from PyQt5.QtGui import (QFont, QColor, QPainter, QBrush, QPen, QIcon, 
-                         QPixmap, QPainterPath, QLinearGradient, QRadialGradient)
-
-# 数据保存路径
-SAVE_FILE = os.path.join(os.path.dirname(__file__), 'pet_data.json')
-
-class PetData:
-    """宠物数据管理"""
-    def __init__(self):
-        self.name = "海绵宝宝"
+
+# 启动各阶段的时间点（perf_counter 秒），bench.py startup 会读取
+startup_times = {'import_start': time.perf_counter()}
+
+from PyQt5.QtWidgets import (QApplication, QWidget, QSystemTrayIcon, QMenu, QAction,
+                             QDesktopWidget)
+from PyQt5.QtCore import (Qt, QTimer, QPoint, QPointF, QRect, QObject, QElapsedTimer,
+                          QEvent, pyqtSignal)
+from PyQt5.QtGui import (QFont, QColor, QPainter, QBrush, QPen, QIcon, QImage, QMouseEvent,
+                         QPixmap, QPainterPath, QLinearGradient, QRegion)
+
+from pet_rules import (STAT_MAX, ACTION_EFFECTS, PLAY_MIN_HUNGER, FIRST_LEVEL_EXP, EXP_GROWTH,
+                       HUNGRY_BELOW, DIRTY_BELOW, clamp_stat, decay_stats, mood_of)
+
+# 数据保存路径（旧版为同名 .json）
+SAVE_FILE = os.path.join(os.path.dirname(__file__), 'pet_data.sav')
+
+# 二进制存档：魔数、当前版本、文件头（魔数、版本、数据 CRC32）
+SAVE_MAGIC = b'SBPD'
+SAVE_VERSION = 2
+SAVE_HEADER = struct.Struct('<4sHI')
+
+# 数值历史：文件魔数和版本、记录的数值，以及聚合层级 (名字, 桶宽秒数, 保留桶数)。
+# 各层都是定长环形缓冲，文件大小固定，与宠物活了多久无关
+HISTORY_MAGIC = b'SBHS'
+HISTORY_VERSION = 1
+HISTORY_STATS = ('hunger', 'health', 'clean', 'happiness')
+HISTORY_LEVELS = (('minute', 60, 2880), ('hour', 3600, 1440), ('day', 86400, 730))
+
+# 各版本二进制存档的字段布局：(字段, struct 格式)；版本 1 是旧的 JSON 存档
+SAVE_LAYOUTS = {
+    2: (('name', '64s'), ('birth_date', '32s'),
+        ('level', 'I'), ('exp', 'I'), ('exp_to_next', 'I'),
+        ('hunger', 'd'), ('health', 'd'), ('clean', 'd'), ('happiness', 'd'),
+        ('total_play_time', 'd'), ('last_saved', 'd')),
+}
+
+# 存档合并写入的间隔（秒）
+SAVE_INTERVAL = 5.0
+
+# 统一帧循环的间隔（毫秒），以及每个子系统单帧最多补跑的次数
+FRAME_INTERVAL_MS = 30
+MAX_CATCHUP_STEPS = 5
+
+# 运动按真实时间积分（像素/秒、像素/秒²），与帧率无关；
+# 窗口位置另按 WINDOW_MOVE_MS 限频同步，中间的亚像素位移在绘制时补上
+WALK_SPEED = 100.0
+JUMP_SPEED = 400.0
+GRAVITY = 890.0
+WINDOW_MOVE_MS = 50
+
+# 拖动时离屏幕边缘或其他控件的边小于这个距离（像素）就吸附过去
+SNAP_DISTANCE = 12
+
+# 自动省电：无操作多少分钟后进入空闲，空闲时的帧间隔（2 fps）
+IDLE_MINUTES = 5
+IDLE_FRAME_INTERVAL_MS = 500
+
+# 姿态缓存最多保留的帧数（多只宠物共用）
+POSE_CACHE_SIZE = 512
+
+# 烘焙图集：文件格式版本（改了格式才需要加一）和存放目录
+SPRITE_ATLAS_VERSION = 1
+SPRITE_DIR = os.path.join(os.path.dirname(SAVE_FILE), 'sprites')
+# 超过这么久（秒）的图集临时文件才当作被打断的烘焙留下的，较新的可能正被别的进程写
+SPRITE_TMP_MAX_AGE = 3600
+
+# 行为状态机：自由活动时多久换一次行为（毫秒）
+BEHAVIOR_INTERVAL_MS = 3000
+
+# 心情 -> (强制进入的状态, 打开的特效)；不在表里的心情按 BEHAVIOR_CHOICES 随机活动
+MOOD_STATES = {
+    'hungry': ('hungry', 'show_question'),
+    'dirty': ('dirty', 'show_dirt'),
+    'sad': ('sad', None),
+}
+
+# 心情 -> 随机行为候选，重复即权重
+BEHAVIOR_CHOICES = {
+    'happy': ('idle', 'walk', 'jump', 'dance', 'happy'),
+    'default': ('idle', 'idle', 'walk', 'walk', 'idle'),
+}
+
+# 动作 -> (状态, 持续毫秒, 打开的特效, 关闭的特效)
+ACTION_STATES = {
+    'feed': ('eating', 2000, 'show_food', 'show_question'),
+    'wash': ('washing', 2000, 'show_water', 'show_dirt'),
+    'play': ('playing', 2000, 'show_hearts', None),
+    'pet': ('happy', 1500, 'show_hearts', None),
+}
+
+# 进入状态时调用的宿主方法
+STATE_ENTER = {
+    'walk': 'pick_direction',
+    'jump': 'start_jump',
+}
+
+# 这些状态不会被心情变化和随机行为打断
+BUSY_STATES = frozenset(['eating', 'washing', 'playing', 'sleep'])
+
+# 动画关键帧轨道：状态 -> {参数: 轨道}，启动时编译成每帧一行的查找表。
+# 轨道可以是常数、('sin', 振幅, 角速度[, 基准])、('abs_sin', 振幅, 角速度, 基准)
+# 或 ('keys', [(帧, 值), ...], 缓动)；没写的参数取 ANIMATION_DEFAULTS。
+ANIMATION_FRAMES = 60
+ANIMATION_PARAMS = ('eye_scale', 'mouth_open', 'arm_angle', 'leg_offset', 'body_squash')
+ANIMATION_DEFAULTS = {'eye_scale': 1.0, 'mouth_open': 0.3, 'arm_angle': 0, 'leg_offset': 0,
+                      'body_squash': 1.0}
+ANIMATION_TRACKS = {
+    'idle': {'eye_scale': ('sin', 0.05, 0.2, 1.0), 'arm_angle': ('sin', 5, 0.1)},
+    'walk': {'mouth_open': 0.4, 'arm_angle': ('sin', 20, 0.4), 'leg_offset': ('sin', 8, 0.4)},
+    # 身体微微晃动
+    'hungry': {'eye_scale': 0.8, 'mouth_open': 0.2, 'body_squash': ('sin', 0.02, 0.3, 1.0)},
+    'dirty': {'eye_scale': 0.9, 'mouth_open': 0.2, 'arm_angle': -10},
+    'sad': {'eye_scale': 0.7, 'mouth_open': 0.1, 'arm_angle': -15},
+    'happy': {'eye_scale': 1.2, 'mouth_open': 0.7, 'arm_angle': ('sin', 30, 0.5),
+              'leg_offset': ('sin', 5, 0.5)},
+    'eating': {'eye_scale': 1.1, 'mouth_open': ('abs_sin', 0.4, 0.5, 0.3), 'arm_angle': 40},
+    # 闭眼搓澡
+    'washing': {'eye_scale': 0.8, 'mouth_open': 0.5, 'arm_angle': ('sin', 20, 0.3),
+                'body_squash': ('sin', 0.05, 0.4, 1.0)},
+    'dance': {'eye_scale': 1.1, 'mouth_open': 0.6, 'arm_angle': ('sin', 50, 0.4),
+              'leg_offset': ('sin', 12, 0.4), 'body_squash': ('sin', 0.08, 0.3, 1.0)},
+    'jump': {'eye_scale': 1.3, 'mouth_open': 0.8, 'arm_angle': -40},
+    # 呼吸起伏
+    'sleep': {'eye_scale': 0.3, 'mouth_open': 0.1, 'body_squash': ('sin', 0.02, 0.1, 1.0)},
+}
+ANIMATION_TRACKS['playing'] = ANIMATION_TRACKS['happy']
+
+# 切换状态时的淡入帧数（动画帧，50ms 一帧）
+CROSSFADE_FRAMES = 4
+
+# 全部动画状态，烘焙图集时逐个播放
+ANIMATION_STATES = ('idle', 'walk', 'hungry', 'dirty', 'sad', 'happy', 'playing',
+                    'eating', 'washing', 'dance', 'jump', 'sleep')
+
+# 时钟省电模式：光晕预渲染帧数（0 为关闭光晕）和呼吸周期
+CLOCK_GLOW_FRAMES = 16
+GLOW_PERIOD_MS = int(2 * math.pi / 0.05 * 50)
+
+# 粒子种类、每只宠物的粒子预算和各类上限
+PARTICLE_HEART, PARTICLE_WATER, PARTICLE_FOOD = 0, 1, 2
+PARTICLE_BUDGET = 64
+PARTICLE_LIMITS = {PARTICLE_FOOD: 3}
+
+# 海绵孔洞位置，以及孔洞大小的布局种类数（同一种布局的宠物共用渲染缓存）
+HOLE_VARIANTS = 4
+HOLE_POSITIONS = [(40, 45), (60, 40), (85, 47), (45, 62), (72, 58), (92, 65),
+                  (43, 82), (65, 78), (88, 85), (50, 100), (75, 96)]
+
+# 帧时序记录最多保留的事件数（环形缓冲）
+TRACE_CAPACITY = 100000
+
+# 录制日志的格式版本
+SESSION_VERSION = 1
+
+# 界面配色：名字 -> RGBA
+DEFAULT_THEME = {
+    'panel': (40, 45, 80, 230),          # 状态面板背景
+    'panel_border': (255, 220, 100, 100),
+    'title': (255, 230, 150),
+    'label': (200, 200, 220),
+    'track': (60, 60, 80),               # 进度条底色
+    'value': (255, 255, 255),
+    'clock_glow': (255, 220, 100),
+    'clock_top': (40, 45, 80, 230),      # 时钟背景渐变
+    'clock_bottom': (20, 25, 50, 250),
+    'time_top': (255, 230, 150),         # 时间文字渐变
+    'time_bottom': (255, 180, 80),
+    'date': (180, 200, 255, 200),
+}
+
+# 姿态参数：量化后作为缓存键
+Pose = namedtuple('Pose', ['eye_scale', 'mouth_open', 'arm_angle',
+                           'leg_offset', 'body_squash', 'direction'])
+
+class FrameTracer:
+    """帧时序记录
+
+    记录定时任务、paintEvent 和存档的起止时间，内存占用由环形缓冲限定，
+    可导出为 Chrome / Perfetto 能直接打开的 trace-event JSON。
+    另外保留最近若干帧的摘要（帧间隔、任务耗时、绘制耗时）给 FrameHud 用。
+    """
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.events = deque(maxlen=capacity)
+        self.frames = deque(maxlen=120)
+        self.origin = time.perf_counter()
+        self.paint_time = 0.0
+        self.threads = {}
+        
+    def record(self, name, cat, start, end=None):
+        if end is None:
+            end = time.perf_counter()
+        ident = threading.get_ident()
+        tid = self.threads.get(ident)
+        if tid is None:
+            tid = self.threads[ident] = (len(self.threads) + 1, threading.current_thread().name)
+        self.events.append((name, cat, start, end - start, tid))
+        if cat == 'paint':
+            self.paint_time += end - start
+            
+    def end_frame(self, dt, start):
+        """一帧结束：记录帧间隔、本帧任务耗时和上一帧之后的绘制耗时（毫秒）"""
+        end = time.perf_counter()
+        self.record('frame', 'frame', start, end)
+        self.frames.append((dt, (end - start) * 1000, self.paint_time * 1000))
+        self.paint_time = 0.0
+        
+    def save(self, path):
+        pid = os.getpid()
+        events = [{'name': name, 'cat': cat, 'ph': 'X', 'pid': pid, 'tid': tid[0],
+                   'ts': round((start - self.origin) * 1e6, 1), 'dur': round(dur * 1e6, 1)}
+                  for name, cat, start, dur, tid in list(self.events)]
+        for tid, name in self.threads.values():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': name}})
+        write_json_atomic(path, {'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+# 开启 --trace 或 --hud 时由 PetClockApp 创建
+frame_tracer = None
+
+
+class SessionLog(QObject):
+    """会话录制与回放
+
+    录制时记下随机种子、起始时间、每只宠物的存档快照和位置、每帧的间隔，
+    以及发给已登记控件的鼠标事件和菜单动作（按发生时已跑完的帧数存放）。
+    回放时用同样的种子和快照重建应用，帧循环不再等待、直接按录下的间隔
+    推进，并在对应帧之前把输入重新发给同名控件。日志是 gzip 压缩的 JSON。
+    """
+    MOUSE_EVENTS = (QEvent.MouseButtonPress, QEvent.MouseButtonRelease,
+                    QEvent.MouseButtonDblClick, QEvent.MouseMove)
+    # 回放时以当前命令行为准的选项（用于对比性能）
+    PROFILE_OPTIONS = ('trace', 'hud', 'paint_stats', 'no_sprite_atlas', 'record', 'replay')
+    
+    def __init__(self, path, replaying=False):
+        super().__init__()
+        self.path = path
+        self.replaying = replaying
+        self.targets = {}      # 名字 -> 对象
+        self.names = {}        # id(对象) -> 名字
+        self.dts = array('H')
+        self.events = []
+        self.cursor = 0
+        self.frame = 0
+        self.elapsed_ms = 0
+        self.seed = random.randrange(2 ** 32)
+        self.start = time.time()
+        self.options = {}
+        self.pets = []
+        self.on_finished = None
+        if replaying:
+            self.load()
+            
+    def load(self):
+        import gzip
+        import base64
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            log = json.load(f)
+        if log.get('version') != SESSION_VERSION:
+            raise ValueError(f"不支持的录制日志版本: {log.get('version')}")
+        self.seed = log['seed']
+        self.start = log['start']
+        self.options = log['options']
+        self.pets = log['pets']
+        self.dts.frombytes(base64.b64decode(log['dts']))
+        self.events = log['events']
+        
+    def save(self):
+        import gzip
+        import base64
+        log = {
+            'version': SESSION_VERSION,
+            'seed': self.seed,
+            'start': self.start,
+            'options': self.options,
+            'pets': self.pets,
+            'dts': base64.b64encode(self.dts.tobytes()).decode('ascii'),
+            'events': self.events,
+        }
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump(log, f, ensure_ascii=False, separators=(',', ':'))
+            
+    def apply_options(self, options):
+        """录制时保存选项；回放时换成录制时的选项，性能相关的仍以当前为准"""
+        if not self.replaying:
+            self.options = {key: value for key, value in vars(options).items()
+                            if key not in self.PROFILE_OPTIONS}
+            return
+        for key, value in self.options.items():
+            setattr(options, key, value)
+        # 空闲由日志里的 set_idle 驱动，不再按真实时间判断
+        options.idle_minutes = 0
+        
+    def register(self, name, target):
+        self.targets[name] = target
+        self.names[id(target)] = name
+        
+    def now(self):
+        """虚拟时钟：回放时为录制起点加上已推进的帧间隔"""
+        if self.replaying:
+            return self.start + self.elapsed_ms / 1000
+        return time.time()
+        
+    def record_call(self, target, method, *args):
+        """记录一次菜单/托盘动作，回放时原样调用"""
+        name = self.names.get(id(target))
+        if name is not None and not self.replaying:
+            self.events.append([self.frame, 'call', name, method, *args])
+            
+    def eventFilter(self, obj, event):
+        if event.type() in self.MOUSE_EVENTS:
+            name = self.names.get(id(obj))
+            if name is not None:
+                local, pos = event.localPos(), event.screenPos()
+                self.events.append([self.frame, 'mouse', name, int(event.type()),
+                                    local.x(), local.y(), pos.x(), pos.y(),
+                                    int(event.button()), int(event.buttons())])
+        return False
+        
+    def next_frame(self, dt):
+        """帧循环每帧开始时调用：录制时记下 dt，回放时先重放输入再返回录下的 dt"""
+        if not self.replaying:
+            self.frame += 1
+            self.dts.append(min(dt, 0xFFFF))
+            return dt
+        if self.frame >= len(self.dts):
+            if self.on_finished:
+                self.on_finished()
+                self.on_finished = None
+            return 0
+        while self.cursor < len(self.events) and self.events[self.cursor][0] <= self.frame:
+            self.dispatch(self.events[self.cursor])
+            self.cursor += 1
+        dt = self.dts[self.frame]
+        self.frame += 1
+        self.elapsed_ms += dt
+        return dt
+        
+    def dispatch(self, entry):
+        _, kind, name, *args = entry
+        target = self.targets[name]
+        if kind == 'call':
+            method, *call_args = args
+            getattr(target, method)(*call_args)
+        elif kind == 'mouse':
+            etype, lx, ly, gx, gy, button, buttons = args
+            event = QMouseEvent(QEvent.Type(etype), QPointF(lx, ly), QPointF(gx, gy),
+                                Qt.MouseButton(button), Qt.MouseButtons(buttons), Qt.NoModifier)
+            QApplication.sendEvent(target, event)
+
+
+# 开启 --record 或 --replay 时由 PetClockApp 创建
+session = None
+
+
+def session_time():
+    """当前时间戳，回放时取虚拟时钟"""
+    return session.now() if session is not None else time.time()
+
+
+def traced(cat):
+    """记录函数耗时的装饰器，未开启记录时只多一次判断"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if frame_tracer is None:
+                return func(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                frame_tracer.record(f"{type(self).__name__}.{func.__name__}", cat, start)
+        return wrapper
+    return decorator
+
+
+# 存档迁移：旧版本号 -> 把该版本的数据升一级的函数
+SAVE_MIGRATIONS = {}
+
+
+def register_migration(version):
+    """注册从 version 升到 version + 1 的迁移步骤"""
+    def decorator(func):
+        SAVE_MIGRATIONS[version] = func
+        return func
+    return decorator
+
+
+@register_migration(1)
+def migrate_json_save(data):
+    """旧版 JSON 存档：只保留已知字段并统一类型，多余的键丢弃"""
+    types = {'name': str, 'birth_date': str, 'level': int, 'exp': int, 'exp_to_next': int,
+             'hunger': float, 'health': float, 'clean': float, 'happiness': float,
+             'total_play_time': float, 'last_saved': float}
+    return {field: cast(data[field]) for field, cast in types.items() if field in data}
+
+
+@functools.lru_cache(maxsize=None)
+def save_struct(version):
+    return struct.Struct('<' + ''.join(fmt for _, fmt in SAVE_LAYOUTS[version]))
+
+
+def encode_save(data):
+    """按当前版本的布局打包成 文件头 + 定长数据"""
+    values = []
+    for field, fmt in SAVE_LAYOUTS[SAVE_VERSION]:
+        value = data[field]
+        values.append(value.encode('utf-8') if fmt.endswith('s') else value)
+    payload = save_struct(SAVE_VERSION).pack(*values)
+    return SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, zlib.crc32(payload)) + payload
+
+
+def decode_save(raw):
+    """解析存档内容，返回 (版本, 数据)；二进制存档校验失败时抛 ValueError"""
+    if not raw.startswith(SAVE_MAGIC):
+        return 1, json.loads(raw.decode('utf-8'))
+    magic, version, checksum = SAVE_HEADER.unpack_from(raw)
+    if version not in SAVE_LAYOUTS:
+        raise ValueError(f"未知的存档版本 {version}")
+    payload = raw[SAVE_HEADER.size:]
+    layout = save_struct(version)
+    if len(payload) != layout.size or zlib.crc32(payload) != checksum:
+        raise ValueError("存档校验失败")
+    data = {}
+    for (field, fmt), value in zip(SAVE_LAYOUTS[version], layout.unpack(payload)):
+        data[field] = value.rstrip(b'\0').decode('utf-8', 'ignore') if fmt.endswith('s') else value
+    return version, data
+
+
+def read_save(path):
+    """读取存档并按注册的迁移步骤升到当前版本"""
+    with open(path, 'rb') as f:
+        version, data = decode_save(f.read())
+    while version < SAVE_VERSION:
+        data = SAVE_MIGRATIONS[version](data)
+        version += 1
+    return data
+
+
+def write_save(path, data):
+    """原子写入二进制存档，原来的存档保留为 .bak 作为上一份完好快照
+
+    原来的存档已经损坏时不能拿它覆盖 .bak（加载时正是靠 .bak 恢复的），
+    改名为 .corrupt 留着排查。
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_save(data))
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        os.replace(path, path + ('.bak' if is_valid_save(path) else '.corrupt'))
+    os.replace(tmp_path, path)
+
+
+def is_valid_save(path):
+    try:
+        with open(path, 'rb') as f:
+            decode_save(f.read())
+        return True
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return False
+
+
+def save_candidates(path):
+    """加载顺序：存档、上一份快照、旧版 JSON 存档"""
+    return [path, path + '.bak', os.path.splitext(path)[0] + '.json']
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再改名，写到一半崩溃也不会截断原存档"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class NullSaver:
+    """什么都不写的存档器：烘焙子进程这类只借用 PetData 的场合"""
+    def submit(self, path, data):
+        pass
+        
+    def flush(self):
+        pass
+
+
+class SaveWorker:
+    """后台存档线程
+
+    submit() 只把每个存档文件的最新快照记下来，后台线程在 interval 秒内
+    合并多次修改后原子写盘一次；界面线程从不等待磁盘。多只宠物共用一个
+    线程。flush() 在退出时同步写完剩余数据。
+    """
+    def __init__(self, interval=SAVE_INTERVAL):
+        self.interval = interval
+        self.pending = {}
+        self.last_error = None
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='SaveWorker', daemon=True)
+        self.thread.start()
+        
+    def submit(self, path, data):
+        with self.lock:
+            self.pending[path] = data
+        self.dirty.set()
+        
+    def run(self):
+        while not self.stopping.is_set():
+            self.dirty.wait()
+            # 合并窗口：这段时间内的修改只写一次
+            self.stopping.wait(self.interval)
+            self.write_pending()
+            
+    @traced('io')
+    def write_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.dirty.clear()
+        for path, data in pending.items():
+            try:
+                write_save(path, data)
+                self.writes += 1
+                self.last_error = None
+            except OSError as e:
+                # 写失败时保留数据，下个周期重试（期间若有更新的快照则以新的为准）
+                self.last_error = e
+                with self.lock:
+                    self.pending.setdefault(path, data)
+                    self.dirty.set()
+                    
+    def flush(self):
+        """停止后台线程并同步写完剩余数据"""
+        self.stopping.set()
+        self.dirty.set()
+        self.thread.join()
+        self.write_pending()
+
+
+class StatHistory:
+    """数值历史（mmap 环形缓冲）
+
+    每个层级一个环，每条记录是 (桶起点, 样本数, 各数值最小值, 最大值,
+    总和)。每次 tick 对每个层级各更新一次：还在同一个桶里就原地累加，
+    进入新桶就覆盖最老的一条。图表按缩放直接读对应层级，不再现算。
+    """
+    HEADER = struct.Struct('<4sHH' + 'II' * len(HISTORY_LEVELS))  # 魔数、版本、保留、各层 (head, count)
+    RECORD = struct.Struct(f'<dI{3 * len(HISTORY_STATS)}f')
+    
+    def __init__(self, path):
+        self.path = path
+        self.generation = 0  # 每追加一次加一，图表据此判断是否要重画
+        self.offsets = {}
+        offset = self.HEADER.size
+        for name, span, capacity in HISTORY_LEVELS:
+            self.offsets[name] = offset
+            offset += capacity * self.RECORD.size
+        self.size = offset
+        self.open()
+        
+    def open(self):
+        fresh = not os.path.exists(self.path) or os.path.getsize(self.path) != self.size
+        with open(self.path, 'w+b' if fresh else 'r+b') as f:
+            if fresh:
+                f.truncate(self.size)
+            self.buffer = mmap.mmap(f.fileno(), self.size)
+        magic, version, _, *state = self.HEADER.unpack_from(self.buffer)
+        if magic != HISTORY_MAGIC or version != HISTORY_VERSION:
+            state = [0] * (2 * len(HISTORY_LEVELS))
+        self.heads = dict(zip(self.offsets, state[0::2]))
+        self.counts = dict(zip(self.offsets, state[1::2]))
+        self.write_header()
+        
+    def write_header(self):
+        state = []
+        for name in self.offsets:
+            state += [self.heads[name], self.counts[name]]
+        self.HEADER.pack_into(self.buffer, 0, HISTORY_MAGIC, HISTORY_VERSION, 0, *state)
+        
+    def record_pos(self, name, index):
+        return self.offsets[name] + index * self.RECORD.size
+        
+    def append(self, timestamp, values):
+        """记一个样本，各层级增量更新"""
+        n = len(values)
+        for name, span, capacity in HISTORY_LEVELS:
+            start = timestamp - timestamp % span
+            head, count = self.heads[name], self.counts[name]
+            if count:
+                record = self.RECORD.unpack_from(self.buffer, self.record_pos(name, head))
+                if record[0] == start:
+                    self.RECORD.pack_into(
+                        self.buffer, self.record_pos(name, head), start, record[1] + 1,
+                        *map(min, record[2:2 + n], values),
+                        *map(max, record[2 + n:2 + 2 * n], values),
+                        *(total + value for total, value in zip(record[2 + 2 * n:], values)))
+                    continue
+                if start < record[0]:
+                    continue  # 时钟回拨，丢弃
+                head = (head + 1) % capacity
+            self.heads[name] = head
+            self.counts[name] = min(count + 1, capacity)
+            self.RECORD.pack_into(self.buffer, self.record_pos(name, head), start, 1,
+                                  *values, *values, *values)
+        self.write_header()
+        self.generation += 1
+        
+    def window(self, name, buckets, now):
+        """最近 buckets 个桶的记录，从旧到新：[(桶起点, 最小值, 最大值, 平均值)]"""
+        span, capacity = next((span, capacity) for level, span, capacity in HISTORY_LEVELS
+                              if level == name)
+        cutoff = now - now % span - (buckets - 1) * span
+        n = len(HISTORY_STATS)
+        records = []
+        head = self.heads[name]
+        for i in range(min(buckets, self.counts[name])):
+            record = self.RECORD.unpack_from(self.buffer, self.record_pos(name, (head - i) % capacity))
+            if record[0] < cutoff:
+                break
+            count = record[1]
+            records.append((record[0], record[2:2 + n], record[2 + n:2 + 2 * n],
+                            [total / count for total in record[2 + 2 * n:]]))
+        records.reverse()
+        return records
+        
+    def close(self):
+        self.buffer.flush()
+        self.buffer.close()
+
+
+def history_path(save_file):
+    return os.path.splitext(save_file)[0] + '.hist'
+
+
+def save_slot_path(slot):
+    """第 slot 只宠物的存档文件：0 号为 SAVE_FILE，其余为同目录下的 pet_data_{slot}.sav"""
+    if slot == 0:
+        return SAVE_FILE
+    return os.path.join(os.path.dirname(SAVE_FILE), f'pet_data_{slot}.sav')
+
+
+class PetData(QObject):
+    """宠物数据管理
+
+    数值都通过 set_stats() 修改，变化时发出信号；心情缓存起来，只在
+    相关数值变化时重新计算。界面订阅信号，不再轮询。
+    """
+    stat_changed = pyqtSignal(str, object)  # 字段名, 新值
+    mood_changed = pyqtSignal(str)
+    leveled_up = pyqtSignal(int)
+    history_appended = pyqtSignal()  # 数值历史追加了一条记录
+    
+    # 写入存档的字段
+    FIELDS = ('name', 'level', 'exp', 'exp_to_next', 'hunger', 'health', 'clean',
+              'happiness', 'total_play_time', 'birth_date', 'last_saved')
+    # 影响心情的数值
+    MOOD_STATS = frozenset(['hunger', 'clean', 'health', 'happiness'])
+    
+    def __init__(self, save_file=None, saver=None, name="海绵宝宝", history=None):
+        super().__init__()
+        self.save_file = save_file or SAVE_FILE
+        self.history = history
+        self.name = name
         self.level = 1
         self.exp = 0
-        self.exp_to_next = 100
+        self.exp_to_next = FIRST_LEVEL_EXP
         self.hunger = 100  # 饱腹感 0-100
         self.health = 100  # 健康值 0-100
         self.clean = 100   # 清洁度 0-100
         self.happiness = 100  # 快乐值 0-100
         self.total_play_time = 0
-        self.birth_date = datetime.now().isoformat()
+        self.birth_date = datetime.fromtimestamp(session_time()).isoformat()
+        self.last_saved = session_time()
         self.load()
+        self.mood = self.compute_mood()
+        self.saver = saver or SaveWorker()
         
     def load(self):
-        if os.path.exists(SAVE_FILE):
+        """依次尝试存档、上一份快照和旧版 JSON 存档，坏掉的记在 load_errors 里"""
+        self.load_errors = []
+        for path in save_candidates(self.save_file):
+            if not os.path.isfile(path):
+                continue
             try:
-                with open(SAVE_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.__dict__.update(data)
-            except:
-                pass
+                data = read_save(path)
+            except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+                self.load_errors.append(f"{path}: {e}")
+                print(f"存档无法读取，已跳过：{path}: {e}", file=sys.stderr)
+                continue
+            for field in self.FIELDS:
+                if field in data:
+                    setattr(self, field, data[field])
+            if 'last_saved' in data:
+                self.catch_up(session_time() - self.last_saved)
+            return
                 
+    def catch_up(self, seconds):
+        """补上程序关闭期间错过的 tick（每分钟一次）"""
+        minutes = int(seconds // 60)
+        if minutes <= 0:
+            return
+        self.hunger, self.clean, self.health, self.happiness = decay_stats(
+            self.hunger, self.clean, self.health, self.happiness, minutes)
+        self.last_saved += minutes * 60
+        
+    def to_dict(self):
+        self.last_saved = session_time()
+        return {field: getattr(self, field) for field in self.FIELDS}
+        
+    @traced('save')
     def save(self):
-        with open(SAVE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.__dict__, f, ensure_ascii=False, indent=2)
-            
+        """标记为已修改，由后台线程合并后写盘"""
+        self.saver.submit(self.save_file, self.to_dict())
+        
+    def set_stats(self, **values):
+        """修改数值，对真正变了的字段发出 stat_changed，必要时更新心情"""
+        changed = [name for name, value in values.items() if getattr(self, name) != value]
+        for name in changed:
+            setattr(self, name, values[name])
+        for name in changed:
+            self.stat_changed.emit(name, values[name])
+        if self.MOOD_STATS.intersection(changed):
+            mood = self.compute_mood()
+            if mood != self.mood:
+                self.mood = mood
+                self.mood_changed.emit(mood)
+                
     def add_exp(self, amount):
-        self.exp += amount
-        while self.exp >= self.exp_to_next:
-            self.exp -= self.exp_to_next
-            self.level += 1
-            self.exp_to_next = int(self.exp_to_next * 1.2)
+        exp, level, exp_to_next = self.exp + amount, self.level, self.exp_to_next
+        while exp >= exp_to_next:
+            exp -= exp_to_next
+            level += 1
+            exp_to_next = int(exp_to_next * EXP_GROWTH)
+        leveled = level > self.level
+        self.set_stats(exp=exp, level=level, exp_to_next=exp_to_next)
+        if leveled:
+            self.leveled_up.emit(level)
         self.save()
         
+    def apply_action(self, action):
+        """按 ACTION_EFFECTS 修改数值并加经验"""
+        deltas, exp = ACTION_EFFECTS[action]
+        self.set_stats(**{name: clamp_stat(getattr(self, name) + delta)
+                          for name, delta in deltas.items()})
+        self.add_exp(exp)
+        return True
+        
     def feed(self):
-        if self.hunger < 100:
-            self.hunger = min(100, self.hunger + 30)
-            self.happiness = min(100, self.happiness + 10)
-            self.add_exp(10)
-            return True
-        return False
+        return self.hunger < STAT_MAX and self.apply_action('feed')
         
     def wash(self):
-        if self.clean < 100:
-            self.clean = min(100, self.clean + 40)
-            self.health = min(100, self.health + 10)
-            self.add_exp(10)
-            return True
-        return False
+        return self.clean < STAT_MAX and self.apply_action('wash')
         
     def play(self):
-        if self.hunger > 20:
-            self.happiness = min(100, self.happiness + 25)
-            self.hunger = max(0, self.hunger - 10)
-            self.add_exp(15)
-            return True
-        return False
+        return self.hunger > PLAY_MIN_HUNGER and self.apply_action('play')
         
     def pet(self):
-        self.happiness = min(100, self.happiness + 15)
-        self.add_exp(5)
-        return True
+        return self.apply_action('pet')
         
     def tick(self):
         """每分钟调用，数值自然下降"""
-        self.hunger = max(0, self.hunger - 1)
-        self.clean = max(0, self.clean - 0.5)
-        if self.clean < 30:
-            self.health = max(0, self.health - 0.5)
-        if self.hunger < 20:
-            self.happiness = max(0, self.happiness - 1)
+        hunger, clean, health, happiness = decay_stats(
+            self.hunger, self.clean, self.health, self.happiness, 1)
+        self.set_stats(hunger=hunger, clean=clean, health=health, happiness=happiness)
+        if self.history is not None:
+            self.history.append(session_time(), [getattr(self, name) for name in HISTORY_STATS])
+            self.history_appended.emit()
         self.save()
         
     def get_mood(self):
-        """获取当前心情状态"""
-        if self.hunger < 20:
-            return 'hungry'
-        if self.clean < 30:
-            return 'dirty'
-        if self.health < 30:
-            return 'sick'
-        if self.happiness > 80:
-            return 'happy'
-        if self.happiness < 30:
-            return 'sad'
-        return 'normal'
+        """当前心情（缓存值）"""
+        return self.mood
+        
+    def compute_mood(self):
+        return mood_of(self.hunger, self.clean, self.health, self.happiness)
+
+
+class PaintResources:
+    """共享的绘制资源缓存
+
+    字体、画笔、画刷、颜色和渐变按参数只创建一次，之后一直复用同一个对象
+    （调用方不要修改拿到的对象）。颜色可以写成 RGBA 元组、主题里的名字、
+    (名字, alpha)、(颜色, 变亮系数) 或 Qt 预定义颜色。
+    开启 --paint-stats 时帧循环每帧调用 end_frame()，统计每帧新建了多少对象。
+    """
+    def __init__(self, theme=None):
+        self.theme = dict(theme or DEFAULT_THEME)
+        self.generation = 0
+        self.objects = {}
+        self.allocations = 0
+        self.frame_allocations = deque(maxlen=600)
+        self.frames = 0
+        
+    def set_theme(self, theme):
+        """换主题：清空缓存，各控件看到 generation 变化后重建自己的位图缓存"""
+        self.theme = dict(theme)
+        self.objects.clear()
+        self.generation += 1
+        
+    def get(self, key, create):
+        obj = self.objects.get(key)
+        if obj is None:
+            obj = self.objects[key] = create()
+            self.allocations += 1
+        return obj
+        
+    def color(self, spec):
+        return self.get(('color', spec), lambda: self.make_color(spec))
+        
+    def make_color(self, spec):
+        if isinstance(spec, str):
+            return QColor(*self.theme[spec])
+        if isinstance(spec, tuple):
+            if isinstance(spec[0], str):
+                # (主题名, alpha)
+                return QColor(*self.theme[spec[0]][:3], spec[1])
+            if isinstance(spec[0], tuple):
+                # (颜色, 变亮系数)
+                return self.color(spec[0]).lighter(spec[1])
+            return QColor(*spec)
+        return QColor(spec)
+        
+    def pen(self, spec, width=1):
+        return self.get(('pen', spec, width), lambda: QPen(self.color(spec), width))
+        
+    def brush(self, spec):
+        return self.get(('brush', spec), lambda: QBrush(self.color(spec)))
+        
+    def font(self, family, size, weight=-1):
+        return self.get(('font', family, size, weight), lambda: QFont(family, size, weight))
+        
+    def linear_gradient(self, x1, y1, x2, y2, stops):
+        """线性渐变画刷，stops 为 ((位置, 颜色), ...)"""
+        def create():
+            gradient = QLinearGradient(x1, y1, x2, y2)
+            for pos, spec in stops:
+                gradient.setColorAt(pos, self.color(spec))
+            return QBrush(gradient)
+        return self.get(('gradient', x1, y1, x2, y2, stops), create)
+        
+    def gradient_pen(self, x1, y1, x2, y2, stops, width=1):
+        return self.get(('gradient_pen', x1, y1, x2, y2, stops, width),
+                        lambda: QPen(self.linear_gradient(x1, y1, x2, y2, stops), width))
+        
+    def end_frame(self):
+        """记录上一帧新建的对象数，每 100 帧打印一次统计"""
+        self.frame_allocations.append(self.allocations)
+        self.allocations = 0
+        self.frames += 1
+        if self.frames % 100 == 0:
+            recent = list(self.frame_allocations)[-100:]
+            print(f"绘制资源：最近 100 帧平均新建 {sum(recent) / 100:.2f} 个，"
+                  f"单帧最多 {max(recent)} 个，缓存共 {len(self.objects)} 个", file=sys.stderr)
+
+
+# 全进程共用的绘制资源
+paint_cache = PaintResources()
+
+
+class FrameJob:
+    """帧循环里的一个子系统：固定步长 interval 毫秒调用一次 callback
+
+    owner 为所属控件，控件隐藏时该子系统暂停；没有 owner 的子系统（如
+    PetData.tick）一直按原节奏运行。catchup=False 的子系统落后时只补跑
+    一次，适合纯渲染用的动画。
+    """
+    def __init__(self, interval, callback, owner=None, catchup=True):
+        self.interval = interval
+        self.callback = callback
+        self.owner = owner
+        self.catchup = catchup
+        self.name = getattr(callback, '__qualname__', repr(callback))
+        self.acc = 0
+        
+    def is_active(self):
+        return self.owner is None or self.owner.isVisible()
+
+
+class FrameScheduler(QObject):
+    """统一帧循环
+
+    整个进程只有一个定时器：每帧按真实流逝时间给各子系统累加，
+    按各自的固定步长补跑，最后对本帧请求过重绘的控件统一 update() 一次。
+    下一帧的唤醒时间取帧间隔和最近一个到期子系统中较晚的那个，
+    所以控件全部隐藏时只会在 PetData.tick 之类的后台任务到期时醒来。
+    """
+    def __init__(self, frame_interval=FRAME_INTERVAL_MS):
+        super().__init__()
+        self.jobs = []
+        self.dirty = OrderedDict()
+        self.frame_count = 0
+        self.frame_dt = 0
+        self.frame_interval = frame_interval
+        self.in_frame = False
+        
+        self.elapsed = QElapsedTimer()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        # 粗粒度定时器可能提前最多 5% 醒来，长间隔的任务会因此多跑一帧空转
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.run_frame)
+        
+    def add(self, interval, callback, owner=None, catchup=True):
+        """注册子系统，interval 为 0 表示每帧都跑；返回的 FrameJob 可用于调整频率或移除"""
+        job = FrameJob(interval, callback, owner, catchup)
+        self.jobs.append(job)
+        if interval <= 0:
+            self.wake_soon()
+        return job
+        
+    def remove(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+            
+    def request_update(self, widget):
+        """请求重绘，同一帧内多次请求只会 update() 一次"""
+        self.dirty[widget] = True
+        if not self.in_frame:  # 帧内的请求本帧末尾就会处理
+            self.wake_soon()
+        
+    def set_frame_interval(self, interval):
+        self.frame_interval = interval
+        self.wake()
+        
+    def start(self):
+        self.elapsed.start()
+        self.timer.start(self.frame_interval)
+        
+    def stop(self):
+        self.timer.stop()
+        
+    def wake(self):
+        """立即跑一帧（例如控件重新显示或用户操作后）"""
+        if self.elapsed.isValid():
+            self.timer.start(0)
+            
+    def wake_soon(self):
+        """保证一个帧间隔之内跑下一帧
+
+        循环按最近的后台任务睡着时（最长一分钟），托盘喂食之类的数值变化
+        或新的每帧任务要等到那时才会生效；这里把定时器提前到上一帧之后
+        一个帧间隔，已经排得更早时不动。
+        """
+        if not self.elapsed.isValid():
+            return
+        delay = max(0, self.frame_interval - self.elapsed.elapsed())
+        remaining = self.timer.remainingTime()
+        if remaining < 0 or remaining > delay:
+            self.timer.start(delay)
+            
+    def run_job(self, job):
+        if frame_tracer is None:
+            job.callback()
+        else:
+            start = time.perf_counter()
+            job.callback()
+            frame_tracer.record(job.name, 'job', start)
+            
+    def run_frame(self):
+        dt = self.elapsed.restart()
+        if session is not None:
+            dt = session.next_frame(dt)
+        self.frame_dt = dt
+        self.frame_count += 1
+        frame_start = time.perf_counter()
+        self.in_frame = True
+        
+        # 模拟：每个子系统按自己的步长推进
+        next_due = None
+        for job in list(self.jobs):
+            if not job.is_active():
+                job.acc = 0
+                continue
+            if job.interval <= 0:
+                self.run_job(job)
+                next_due = 0
+                continue
+            job.acc += dt
+            steps = 0
+            limit = MAX_CATCHUP_STEPS if job.catchup else 1
+            while job.acc >= job.interval and steps < limit:
+                job.acc -= job.interval
+                self.run_job(job)
+                steps += 1
+            if steps == limit:
+                job.acc = min(job.acc, job.interval)
+            due = job.interval - job.acc
+            if next_due is None or due < next_due:
+                next_due = due
+                
+        # 渲染：合并后的重绘
+        dirty, self.dirty = self.dirty, OrderedDict()
+        for widget in dirty:
+            if widget.isVisible():
+                widget.update()
+        self.in_frame = False
+                
+        if frame_tracer is not None:
+            frame_tracer.end_frame(dt, frame_start)
+        if session is not None and session.replaying:
+            self.timer.start(0)  # 回放：不等待，直接跑下一帧
+        elif next_due is not None:
+            delay = max(self.frame_interval, int(next_due))
+            # 本帧里 wake()/wake_soon() 已经排了更早的一帧就保留
+            if not 0 <= self.timer.remainingTime() <= delay:
+                self.timer.start(delay)
+
+
+class PowerManager(QObject):
+    """自动省电
+
+    N 分钟没有用户操作就把帧率降到 IDLE_FRAME_INTERVAL_MS 并让宠物睡觉，
+    有任何操作立刻恢复；控件重新显示时立即唤醒帧循环。
+    """
+    INPUT_EVENTS = (QEvent.MouseButtonPress, QEvent.MouseButtonDblClick, QEvent.MouseMove,
+                    QEvent.KeyPress, QEvent.Wheel, QEvent.ContextMenu)
+    
+    def __init__(self, scheduler, pets, idle_minutes=IDLE_MINUTES):
+        super().__init__()
+        self.scheduler = scheduler
+        self.pets = pets
+        self.idle_ms = int(idle_minutes * 60000)
+        self.idle = False
+        self.last_input = time.monotonic()
+        
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self.check_idle)
+        if self.idle_ms > 0:
+            self.idle_timer.start(self.idle_ms)
+            
+    def eventFilter(self, obj, event):
+        etype = event.type()
+        if etype in self.INPUT_EVENTS:
+            self.last_input = time.monotonic()
+            if self.idle:
+                self.set_idle(False)
+        elif etype == QEvent.Show:
+            self.scheduler.wake()
+        return False
+        
+    def check_idle(self):
+        """空闲定时器到期：确实空闲就降频，否则按剩余时间重新计时"""
+        remaining = self.idle_ms - int((time.monotonic() - self.last_input) * 1000)
+        if remaining <= 0:
+            self.set_idle(True)
+        else:
+            self.idle_timer.start(remaining)
+            
+    def set_idle(self, idle):
+        if session is not None:
+            session.record_call(self, 'set_idle', idle)
+        self.idle = idle
+        for pet in self.pets:
+            if idle:
+                pet.fall_asleep()
+            else:
+                pet.wake_up()
+        if idle:
+            self.scheduler.set_frame_interval(IDLE_FRAME_INTERVAL_MS)
+        else:
+            self.scheduler.set_frame_interval(FRAME_INTERVAL_MS)
+            if self.idle_ms > 0:
+                self.idle_timer.start(self.idle_ms)
+
+
+class DragController(QObject):
+    """拖动（宠物、时钟、状态面板共用）
+
+    鼠标移动事件只记下目标位置，由帧循环每帧最多真正移动一次窗口：高回报率
+    鼠标每秒上千个移动事件不再各自触发一次原生窗口重新配置，被后来者覆盖的
+    事件计入 dropped。松手时立即落到最后的位置。拖到离屏幕边缘或其他控件的
+    边 snap 像素以内时吸附过去。
+    """
+    def __init__(self, scheduler, snap=SNAP_DISTANCE):
+        super().__init__()
+        self.scheduler = scheduler
+        self.snap = snap
+        self.movers = {}     # 控件 -> 移动函数 (x, y)
+        self.widget = None   # 正在拖动的控件
+        self.offset = None
+        self.target = None   # 还没落实的左上角位置（全局坐标）
+        self.job = None
+        self.events = 0
+        self.moves = 0
+        
+    @property
+    def dropped(self):
+        return self.events - self.moves
+        
+    def attach(self, widget, mover=None):
+        """让控件可以拖动；mover 默认为 widget.move"""
+        self.movers[widget] = mover or widget.move
+        widget.installEventFilter(self)
+        
+    def eventFilter(self, obj, event):
+        etype = event.type()
+        if etype == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self.begin(obj, event.globalPos())
+        elif etype == QEvent.MouseMove and obj is self.widget:
+            if event.buttons() & Qt.LeftButton:
+                self.events += 1
+                self.target = event.globalPos() - self.offset
+                return True
+        elif etype == QEvent.MouseButtonRelease and obj is self.widget:
+            self.end()
+        return False
+        
+    def begin(self, widget, pos):
+        self.end()
+        self.widget = widget
+        self.offset = pos - widget.mapToGlobal(QPoint(0, 0))
+        self.job = self.scheduler.add(0, self.flush, widget)
+        # 帧循环可能正按下一个后台任务睡着（最长一分钟），按下时就叫醒
+        self.scheduler.wake()
+        
+    def end(self):
+        if self.widget is None:
+            return
+        self.flush()
+        self.scheduler.remove(self.job)
+        self.widget = self.job = self.target = None
+        
+    def flush(self):
+        """落实最新的目标位置"""
+        if self.target is None:
+            return
+        widget = self.widget
+        pos = self.snapped(widget, self.target)
+        self.target = None
+        parent = widget.parentWidget()
+        if parent is not None:
+            pos = parent.mapFromGlobal(pos)
+        if pos != widget.pos():
+            self.movers[widget](pos.x(), pos.y())
+            self.moves += 1
+            
+    def snapped(self, widget, pos):
+        """左上角放在 pos（全局坐标）时，吸附到屏幕边缘或附近控件边之后的位置"""
+        rect = QRect(pos, widget.size())
+        screen = (QApplication.screenAt(rect.center()) or QApplication.primaryScreen()).availableGeometry()
+        xs = [screen.left(), screen.right() + 1]
+        ys = [screen.top(), screen.bottom() + 1]
+        for other in self.movers:
+            if other is widget or not other.isVisible():
+                continue
+            edges = QRect(other.mapToGlobal(QPoint(0, 0)), other.size())
+            near = edges.adjusted(-self.snap, -self.snap, self.snap, self.snap)
+            # 只吸附到在另一个方向上挨得着的控件
+            if near.top() <= rect.bottom() and rect.top() <= near.bottom():
+                xs += [edges.left(), edges.right() + 1]
+            if near.left() <= rect.right() and rect.left() <= near.right():
+                ys += [edges.top(), edges.bottom() + 1]
+        return QPoint(pos.x() + self.nearest(xs, rect.left(), rect.width()),
+                      pos.y() + self.nearest(ys, rect.top(), rect.height()))
+                      
+    def nearest(self, edges, start, size):
+        """[start, start + size) 的两条边对齐到最近一条 edge 的位移，都不够近时为 0"""
+        best = None
+        for edge in edges:
+            for shift in (edge - start, edge - start - size):
+                if abs(shift) <= self.snap and (best is None or abs(shift) < abs(best)):
+                    best = shift
+        return best or 0
+        
+    def stats(self):
+        return {'events': self.events, 'moves': self.moves, 'dropped': self.dropped}
 
 
 class StatusPanel(QWidget):
-    """状态面板"""
-    def __init__(self, pet_data):
+    """状态面板
+
+    只有显示的数值变化时才重绘；外框和每一行都缓存成位图，重绘时只重新
+    栅格化变化了的那几行。
+    """
+    ROW_TOP = 40      # 第一行状态条的 y
+    ROW_STEP = 28     # 行距
+    ROW_HEIGHT = 24   # 每行位图的高度（从状态条上方 4 像素开始）
+    BARS = [
+        ("🍔 饱腹", 'hunger', (255, 180, 100)),
+        ("💖 健康", 'health', (255, 100, 150)),
+        ("🛁 清洁", 'clean', (100, 200, 255)),
+        ("😊 快乐", 'happiness', (255, 220, 100)),
+    ]
+    CHART_TOP = 182   # 历史图表区域的 y 和高度
+    CHART_HEIGHT = 70
+    # 图表缩放：(标题, 聚合层级, 显示的桶数)，滚轮切换
+    ZOOMS = [
+        ("2 小时", 'minute', 120),
+        ("2 天", 'hour', 48),
+        ("30 天", 'day', 30),
+    ]
+    
+    def __init__(self, pet_data, scheduler):
         super().__init__()
         self.pet_data = pet_data
+        self.scheduler = scheduler
+        self.frame_layer = None
+        self.row_layers = {}   # 行号 -> (显示内容, 位图)
+        self.shown = None
+        self.zoom = 0
+        self.chart_layer = None  # (图表键, 位图)
+        self.theme_generation = paint_cache.generation
         self.initUI()
+        pet_data.stat_changed.connect(self.refresh)
+        # 数值不再变化（例如都降到 0）时历史仍在增长，图表要跟着走
+        pet_data.history_appended.connect(self.refresh)
         
     def initUI(self):
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.setFixedSize(200, 180)
+        history = self.pet_data.history is not None
+        self.setFixedSize(200, self.CHART_TOP + self.CHART_HEIGHT + 8 if history else 180)
         
         screen = QDesktopWidget().screenGeometry()
         self.move(screen.width() - 220, 160)
         
-        self.drag_pos = None
+    def display_rows(self):
+        """当前要显示的内容：标题一行，之后每行是 (标签, 文字, 进度条宽度, 起始色, 结束色)"""
+        data = self.pet_data
+        rows = [(f"🧽 {data.name} Lv.{data.level}",)]
+        for label, attr, color in self.BARS:
+            value = getattr(data, attr)
+            rows.append((label, f"{int(value)}", int(106 * value / 100), color, (color, 120)))
+        rows.append(("⭐ 经验", f"{data.exp}/{data.exp_to_next}",
+                     int(106 * data.exp / data.exp_to_next),
+                     (150, 100, 255), (200, 150, 255)))
+        return rows
+        
+    def refresh(self, *changed):
+        """显示内容变化时才请求重绘"""
+        if self.display_rows() != self.shown or self.chart_changed():
+            self.scheduler.request_update(self)
+            
+    def chart_key(self):
+        history = self.pet_data.history
+        return None if history is None else (self.zoom, history.generation)
+        
+    def chart_changed(self):
+        key = self.chart_key()
+        return key is not None and (self.chart_layer is None or self.chart_layer[0] != key)
+            
+    def new_layer(self, height):
+        dpr = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * dpr), int(height * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+        return pixmap
         
+    @traced('paint')
     def paintEvent(self, event):
         painter = QPainter(self)
+        
+        if self.theme_generation != paint_cache.generation:
+            self.theme_generation = paint_cache.generation
+            self.frame_layer = None
+            self.row_layers.clear()
+            self.chart_layer = None
+        if self.frame_layer is None:
+            self.frame_layer = self.new_layer(self.height())
+            frame_painter = QPainter(self.frame_layer)
+            frame_painter.setRenderHint(QPainter.Antialiasing)
+            self.draw_frame(frame_painter)
+            frame_painter.end()
+        painter.drawPixmap(0, 0, self.frame_layer)
+        
+        self.shown = self.display_rows()
+        for index, row in enumerate(self.shown):
+            cached = self.row_layers.get(index)
+            if cached is None or cached[0] != row:
+                cached = (row, self.render_row(index, row))
+                self.row_layers[index] = cached
+            painter.drawPixmap(0, self.row_top(index), cached[1])
+            
+        if self.chart_changed():
+            self.chart_layer = (self.chart_key(), self.render_chart())
+        if self.chart_layer is not None:
+            painter.drawPixmap(0, self.CHART_TOP, self.chart_layer[1])
+            
+    def row_top(self, index):
+        if index == 0:
+            return 8
+        return self.ROW_TOP + (index - 1) * self.ROW_STEP - 4
+        
+    def render_row(self, index, row):
+        """把一行栅格化，行内坐标与原来整面板绘制时一致"""
+        height = 25 if index == 0 else self.ROW_HEIGHT
+        pixmap = self.new_layer(height)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
+        painter.translate(0, -self.row_top(index))
+        if index == 0:
+            self.draw_title(painter, row[0])
+        else:
+            self.draw_bar(painter, self.ROW_TOP + (index - 1) * self.ROW_STEP, *row)
+        painter.end()
+        return pixmap
         
+    def render_chart(self):
+        pixmap = self.new_layer(self.CHART_HEIGHT)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.draw_chart(painter)
+        painter.end()
+        return pixmap
+        
+    def draw_chart(self, painter):
+        """历史曲线：直接读与缩放对应的聚合层级，画每个桶的最小-最大范围和平均值"""
+        title, level, buckets = self.ZOOMS[self.zoom]
+        painter.setFont(paint_cache.font("Microsoft YaHei", 8))
+        painter.setPen(paint_cache.pen('label'))
+        painter.drawText(10, 12, f"📈 {title}")
+        
+        left, top, width, height = 10, 18, 180, self.CHART_HEIGHT - 22
+        painter.setBrush(paint_cache.brush('track'))
+        painter.setPen(Qt.NoPen)
+        painter.drawRoundedRect(left, top, width, height, 4, 4)
+        
+        span = next(span for name, span, _ in HISTORY_LEVELS if name == level)
+        now = session_time()
+        first = now - now % span - (buckets - 1) * span
+        records = self.pet_data.history.window(level, buckets, now)
+        if not records:
+            return
+        
+        def x_of(start):
+            return left + width * (start - first) / max(1, (buckets - 1) * span)
+            
+        def y_of(value):
+            return top + height - height * max(0, min(100, value)) / 100
+            
+        for _, attr, color in self.BARS:
+            index = HISTORY_STATS.index(attr)
+            band = QPainterPath()
+            band.moveTo(x_of(records[0][0]), y_of(records[0][2][index]))
+            for start, _, highs, _ in records[1:]:
+                band.lineTo(x_of(start), y_of(highs[index]))
+            for start, lows, _, _ in reversed(records):
+                band.lineTo(x_of(start), y_of(lows[index]))
+            band.closeSubpath()
+            painter.fillPath(band, paint_cache.brush((*color, 40)))
+            
+            line = QPainterPath()
+            line.moveTo(x_of(records[0][0]), y_of(records[0][3][index]))
+            for start, _, _, means in records[1:]:
+                line.lineTo(x_of(start), y_of(means[index]))
+            painter.strokePath(line, paint_cache.pen((*color, 220), 1.5))
+            
+    def wheelEvent(self, event):
+        """滚轮切换历史图表的时间范围"""
+        if self.pet_data.history is None:
+            return
+        step = -1 if event.angleDelta().y() > 0 else 1
+        self.zoom = max(0, min(len(self.ZOOMS) - 1, self.zoom + step))
+        self.refresh()
+        
+    def draw_frame(self, painter):
         # 背景
         path = QPainterPath()
         path.addRoundedRect(0, 0, self.width(), self.height(), 15, 15)
-        painter.fillPath(path, QBrush(QColor(40, 45, 80, 230)))
+        painter.fillPath(path, paint_cache.brush('panel'))
         
         # 边框
-        painter.setPen(QPen(QColor(255, 220, 100, 100), 2))
+        painter.setPen(paint_cache.pen('panel_border', 2))
         painter.drawRoundedRect(1, 1, self.width()-2, self.height()-2, 15, 15)
         
-        # 标题
-        painter.setFont(QFont("Microsoft YaHei", 11, QFont.Bold))
-        painter.setPen(QColor(255, 230, 150))
-        painter.drawText(QRect(0, 8, self.width(), 25), Qt.AlignCenter, 
-                        f"🧽 {self.pet_data.name} Lv.{self.pet_data.level}")
-        
-        # 状态条
-        y = 40
-        bars = [
-            ("🍔 饱腹", self.pet_data.hunger, QColor(255, 180, 100)),
-            ("💖 健康", self.pet_data.health, QColor(255, 100, 150)),
-            ("🛁 清洁", self.pet_data.clean, QColor(100, 200, 255)),
-            ("😊 快乐", self.pet_data.happiness, QColor(255, 220, 100)),
-        ]
+    def draw_title(self, painter, title):
+        painter.setFont(paint_cache.font("Microsoft YaHei", 11, QFont.Bold))
+        painter.setPen(paint_cache.pen('title'))
+        painter.drawText(QRect(0, 8, self.width(), 25), Qt.AlignCenter, title)
         
-        painter.setFont(QFont("Microsoft YaHei", 9))
-        for label, value, color in bars:
-            # 标签
-            painter.setPen(QColor(200, 200, 220))
-            painter.drawText(10, y + 12, label)
-            
-            # 进度条背景
-            painter.setBrush(QBrush(QColor(60, 60, 80)))
-            painter.setPen(Qt.NoPen)
-            painter.drawRoundedRect(70, y, 110, 16, 8, 8)
-            
-            # 进度条
-            bar_width = int(106 * value / 100)
-            if bar_width > 0:
-                gradient = QLinearGradient(70, y, 70 + bar_width, y)
-                gradient.setColorAt(0, color)
-                gradient.setColorAt(1, color.lighter(120))
-                painter.setBrush(QBrush(gradient))
-                painter.drawRoundedRect(72, y + 2, bar_width, 12, 6, 6)
-            
-            # 数值
-            painter.setPen(QColor(255, 255, 255))
-            painter.drawText(QRect(70, y, 110, 16), Qt.AlignCenter, f"{int(value)}")
-            
-            y += 28
-            
-        # 经验条
-        painter.setPen(QColor(200, 200, 220))
-        painter.drawText(10, y + 12, "⭐ 经验")
+    def draw_bar(self, painter, y, label, text, bar_width, color_start, color_end):
+        painter.setFont(paint_cache.font("Microsoft YaHei", 9))
         
-        painter.setBrush(QBrush(QColor(60, 60, 80)))
+        # 标签
+        painter.setPen(paint_cache.pen('label'))
+        painter.drawText(10, y + 12, label)
+        
+        # 进度条背景
+        painter.setBrush(paint_cache.brush('track'))
         painter.setPen(Qt.NoPen)
         painter.drawRoundedRect(70, y, 110, 16, 8, 8)
         
-        exp_ratio = self.pet_data.exp / self.pet_data.exp_to_next
-        bar_width = int(106 * exp_ratio)
+        # 进度条
         if bar_width > 0:
-            gradient = QLinearGradient(70, y, 70 + bar_width, y)
-            gradient.setColorAt(0, QColor(150, 100, 255))
-            gradient.setColorAt(1, QColor(200, 150, 255))
-            painter.setBrush(QBrush(gradient))
+            painter.setBrush(paint_cache.linear_gradient(
+                70, y, 70 + bar_width, y, ((0, color_start), (1, color_end))))
             painter.drawRoundedRect(72, y + 2, bar_width, 12, 6, 6)
+        
+        # 数值
+        painter.setPen(paint_cache.pen('value'))
+        painter.drawText(QRect(70, y, 110, 16), Qt.AlignCenter, text)
+
+
+class PoseCache:
+    """姿态位图缓存（LRU），键为量化后的动画参数"""
+    def __init__(self, capacity=POSE_CACHE_SIZE):
+        self.capacity = capacity
+        self.pixmaps = OrderedDict()
+        self.atlases = {}
+        self.hits = 0
+        self.misses = 0
+        
+    def add_atlas(self, atlas):
+        """挂上一个烘焙图集，缓存未命中时先从图集取"""
+        self.atlases[(atlas.variant, atlas.dpr)] = atlas
+        
+    def baked(self, variant, pose, dpr):
+        atlas = self.atlases.get((variant, dpr))
+        return atlas.pixmap(pose) if atlas else None
+        
+    def get(self, key, render):
+        """命中则直接返回，否则调用 render(key) 生成并放入缓存"""
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+            self.hits += 1
+            return pixmap
+        self.misses += 1
+        pixmap = render(key)
+        self.pixmaps[key] = pixmap
+        if len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+        
+    def clear(self):
+        self.pixmaps.clear()
+        
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self.pixmaps),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'baked': sum(atlas.loads for atlas in self.atlases.values()),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def sprite_fingerprint():
+    """绘制代码和孔洞布局的摘要，任何一处改动都会让旧图集失效"""
+    import inspect
+    digest = hashlib.sha1(repr((SPRITE_ATLAS_VERSION, HOLE_VARIANTS, HOLE_POSITIONS,
+                                ANIMATION_TRACKS, CROSSFADE_FRAMES)).encode())
+    methods = (sample_track, compile_tracks,
+               SpongeBobPet.set_variant, SpongeBobPet.reset_expression, SpongeBobPet.animate,
+               SpongeBobPet.current_pose, SpongeBobPet.new_layer, SpongeBobPet.render_pose,
+               SpongeBobPet.draw_spongebob, SpongeBobPet.render_body, SpongeBobPet.draw_body)
+    try:
+        for method in methods:
+            digest.update(inspect.getsource(method).encode('utf-8'))
+    except (OSError, TypeError):
+        # 打包后没有源码，退而用可执行文件的修改时间
+        digest.update(str(os.path.getmtime(sys.executable)).encode())
+    return digest.hexdigest()
+
+
+def sprite_atlas_path(variant, dpr):
+    """图集按皮肤（孔洞布局）和设备像素比分文件"""
+    return os.path.join(SPRITE_DIR, f'spongebob-{variant}@{dpr:g}x.atlas')
+
+
+class SpriteAtlas:
+    """烘焙好的姿态位图集
+
+    文件结构：定长文件头、JSON 索引、逐帧 zlib 压缩的 ARGB32 像素。打开时
+    只 mmap 文件并读索引，某个姿态第一次用到时才解压成位图。只存朝右的
+    姿态，朝左的取出后镜像。
+    """
+    MAGIC = b'SBSPRITE'
+    HEADER = struct.Struct('<8sII')  # 魔数、格式版本、索引长度
+    
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.variant = index['variant']
+        self.dpr = index['dpr']
+        self.size = (index['width'], index['height'])
+        self.base = self.HEADER.size + index['length']
+        self.entries = {Pose(*pose): (offset, length) for pose, offset, length in index['sprites']}
+        self.loads = 0
+        
+    @classmethod
+    def open(cls, path, fingerprint):
+        """打开图集；文件不存在、格式不对或绘制代码已变时返回 None"""
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, version, length = cls.HEADER.unpack_from(buffer)
+            if magic != cls.MAGIC or version != SPRITE_ATLAS_VERSION:
+                raise ValueError(path)
+            index = json.loads(buffer[cls.HEADER.size:cls.HEADER.size + length])
+            if index['fingerprint'] != fingerprint:
+                raise ValueError(path)
+        except (struct.error, ValueError, KeyError):
+            buffer.close()
+            return None
+        index['length'] = length
+        return cls(buffer, index)
+        
+    @classmethod
+    def write(cls, path, fingerprint, variant, dpr, size, sprites):
+        """sprites 为 {姿态: 压缩像素}，先写临时文件再改名，失败时删掉临时文件"""
+        import glob
+        
+        entries = []
+        offset = 0
+        for pose, data in sprites.items():
+            entries.append((list(pose), offset, len(data)))
+            offset += len(data)
+        index = json.dumps({'fingerprint': fingerprint, 'variant': variant, 'dpr': dpr,
+                            'width': size[0], 'height': size[1], 'sprites': entries}).encode()
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 上次烘焙同一图集时被打断留下的临时文件；应用和 --bake-sprites 可能
+        # 同时在烘焙，新的临时文件不动
+        stale = time.time() - SPRITE_TMP_MAX_AGE
+        for name in glob.glob(glob.escape(path) + '.*tmp'):
+            try:
+                if os.path.getmtime(name) < stale:
+                    os.remove(name)
+            except OSError:
+                pass
+        # 临时文件名带进程号和随机后缀，同时烘焙同一图集的进程互不干扰；不用
+        # tempfile（0600），按 0666 创建由 umask 决定权限，和其他存档文件一致
+        tmp_path = f'{path}.{os.getpid()}.{os.urandom(4).hex()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(cls.HEADER.pack(cls.MAGIC, SPRITE_ATLAS_VERSION, len(index)))
+                f.write(index)
+                for data in sprites.values():
+                    f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+    def pixmap(self, pose):
+        entry = self.entries.get(pose._replace(direction=1))
+        if entry is None:
+            return None
+        offset, length = entry
+        data = zlib.decompress(self.buffer[self.base + offset:self.base + offset + length])
+        # QImage 不持有 data，先复制（或镜像出一份）再交给 QPixmap
+        image = QImage(data, self.size[0], self.size[1], QImage.Format_ARGB32_Premultiplied)
+        image = image.mirrored(True, False) if pose.direction == -1 else image.copy()
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(self.dpr)
+        self.loads += 1
+        return pixmap
+        
+    def close(self):
+        self.buffer.close()
+
+
+def init_bake_worker():
+    """烘焙子进程：离屏创建 QApplication"""
+    global bake_app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    bake_app = QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def bake_state(variant, dpr, state):
+    """在子进程里播放一轮 state 动画，返回 [(姿态, 宽, 高, 压缩像素)]"""
+    pet = SpongeBobPet(PetData(os.devnull, NullSaver()), FrameScheduler())
+    pet.set_variant(variant)
+    sprites = []
+    for pose in pet.state_poses(state):
+        if pose.direction != 1:
+            continue
+        image = pet.render_pose(('pose', variant, pose, dpr)).toImage()
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        pixels = image.constBits().asstring(image.sizeInBytes())
+        sprites.append((tuple(pose), image.width(), image.height(), zlib.compress(pixels)))
+    return sprites
+
+
+def bake_sprites(variant, dpr, workers=None):
+    """用进程池并行渲染各动画状态的姿态，写成图集文件并返回路径"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    sprites = {}
+    size = None
+    # 用 spawn：主进程里已经有 QApplication 和后台线程，不能 fork
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, context, initializer=init_bake_worker) as pool:
+        for result in pool.map(bake_state, repeat(variant), repeat(dpr), ANIMATION_STATES):
+            for pose, width, height, data in result:
+                sprites.setdefault(Pose(*pose), data)
+                size = (width, height)
+    path = sprite_atlas_path(variant, dpr)
+    SpriteAtlas.write(path, sprite_fingerprint(), variant, dpr, size, sprites)
+    return path
+
+
+class SpriteBaker(QObject):
+    """后台线程里烘焙图集，完成后在界面线程发出 baked(路径)"""
+    baked = pyqtSignal(str)
+    
+    def __init__(self):
+        super().__init__()
+        self.error = None
+        
+    def start(self, jobs):
+        """jobs 为 [(皮肤, 设备像素比)]"""
+        threading.Thread(target=self.run, args=(jobs,), name='SpriteBaker', daemon=True).start()
+        
+    def run(self, jobs):
+        for variant, dpr in jobs:
+            try:
+                self.baked.emit(bake_sprites(variant, dpr))
+            except Exception as e:
+                self.error = e
+
+
+class ParticlePool:
+    """定长粒子池
+
+    粒子数据放在预分配的平行数组里，用空闲栈分配槽位，按种类维护存活
+    下标，更新和绘制都按种类成批进行，运行中不再创建对象。
+    """
+    KINDS = (PARTICLE_HEART, PARTICLE_WATER, PARTICLE_FOOD)
+    
+    def __init__(self, capacity=PARTICLE_BUDGET, limits=PARTICLE_LIMITS):
+        self.capacity = capacity
+        self.limits = limits
+        self.x = array('f', bytes(4 * capacity))
+        self.y = array('f', bytes(4 * capacity))
+        self.vy = array('f', bytes(4 * capacity))
+        self.life = array('h', bytes(2 * capacity))
+        self.free = list(range(capacity - 1, -1, -1))
+        self.live = {kind: [] for kind in self.KINDS}
+        
+    def count(self, kind=None):
+        if kind is None:
+            return self.capacity - len(self.free)
+        return len(self.live[kind])
+        
+    def spawn(self, kind, x, y, vy, life):
+        """分配一个粒子，池满或该种类达到上限时放弃"""
+        if not self.free or len(self.live[kind]) >= self.limits.get(kind, self.capacity):
+            return False
+        i = self.free.pop()
+        self.x[i] = x
+        self.y[i] = y
+        self.vy[i] = vy
+        self.life[i] = life
+        self.live[kind].append(i)
+        return True
+        
+    def step(self):
+        """推进一帧，就地压缩存活下标，死亡槽位归还空闲栈"""
+        y, vy, life, free = self.y, self.vy, self.life, self.free
+        for indices in self.live.values():
+            n = 0
+            for i in indices:
+                y[i] += vy[i]
+                life[i] -= 1
+                if life[i] > 0:
+                    indices[n] = i
+                    n += 1
+                else:
+                    free.append(i)
+            del indices[n:]
+            
+    def clear(self):
+        for indices in self.live.values():
+            self.free.extend(indices)
+            del indices[:]
+
+
+# 缓动函数：0..1 -> 0..1
+EASINGS = {
+    'linear': lambda t: t,
+    'smooth': lambda t: t * t * (3 - 2 * t),
+    'out': lambda t: 1 - (1 - t) * (1 - t),
+}
+
+
+def sample_track(spec, frame):
+    """轨道在第 frame 帧的值"""
+    if isinstance(spec, (int, float)):
+        return spec
+    kind = spec[0]
+    if kind == 'sin':
+        _, amp, speed, *base = spec
+        return (base[0] if base else 0) + amp * math.sin(frame * speed)
+    if kind == 'abs_sin':
+        _, amp, speed, base = spec
+        return base + amp * abs(math.sin(frame * speed))
+    if kind == 'keys':
+        # 关键帧首尾相接循环，段内按缓动插值
+        _, keys, easing = spec
+        ease = EASINGS[easing]
+        for (f0, v0), (f1, v1) in zip(keys, keys[1:] + [(keys[0][0] + ANIMATION_FRAMES, keys[0][1])]):
+            if f0 <= frame < f1 or f0 <= frame + ANIMATION_FRAMES < f1:
+                t = ((frame - f0) % ANIMATION_FRAMES) / (f1 - f0)
+                return v0 + (v1 - v0) * ease(t)
+        return keys[0][1]
+    raise ValueError(f"未知的动画轨道: {spec!r}")
+
+
+def compile_tracks(tracks):
+    """状态 -> 长度 ANIMATION_FRAMES 的表，每行是该帧的全部动画参数"""
+    compiled = {}
+    for state, params in tracks.items():
+        specs = [params.get(name, ANIMATION_DEFAULTS[name]) for name in ANIMATION_PARAMS]
+        compiled[state] = tuple(tuple(sample_track(spec, frame) for spec in specs)
+                                for frame in range(ANIMATION_FRAMES))
+    return compiled
+
+
+compiled_tracks = compile_tracks(ANIMATION_TRACKS)
+
+
+class BehaviorMachine:
+    """宠物行为状态机
+
+    状态、心情和动作的对应关系都在 MOOD_STATES / BEHAVIOR_CHOICES /
+    ACTION_STATES / STATE_ENTER 表里。定时的事情（换行为、动作结束、
+    落地回弹）统一放进一个按到期时间排序的堆，由 advance(ms) 推进虚拟
+    时钟，测试里可以不依赖 Qt 逐步驱动。宿主（SpongeBobPet）提供 state、
+    特效开关和 STATE_ENTER 里的方法。
+    """
+    def __init__(self, host, rng=None):
+        self.host = host
+        self.rng = rng or random
+        self.mood = 'normal'
+        self.now = 0
+        self.queue = []
+        self.latest = {}
+        self.seq = 0
+        self.sleepy = False  # 省电空闲中：忙完之后直接睡觉
+        
+    # ---- 定时事件 ----
+    def after(self, delay, name, func, *args):
+        """delay 毫秒后调用 func(*args)；同名事件只保留最新的一个"""
+        self.seq += 1
+        self.latest[name] = self.seq
+        heapq.heappush(self.queue, (self.now + delay, self.seq, name, func, args))
+        
+    def cancel(self, name):
+        self.latest.pop(name, None)
+        
+    def pending(self, name):
+        return name in self.latest
+        
+    def advance(self, ms):
+        """虚拟时钟前进 ms 毫秒，按到期顺序处理事件"""
+        target = self.now + ms
+        while self.queue and self.queue[0][0] <= target:
+            due, seq, name, func, args = heapq.heappop(self.queue)
+            if self.latest.get(name) != seq:
+                continue  # 已取消或被同名新事件替换
+            del self.latest[name]
+            self.now = max(self.now, due)
+            func(*args)
+        self.now = target
+        
+    # ---- 状态转移 ----
+    def set_state(self, state):
+        self.host.state = state
+        hook = STATE_ENTER.get(state)
+        if hook:
+            getattr(self.host, hook)()
             
-        painter.setPen(QColor(255, 255, 255))
-        painter.drawText(QRect(70, y, 110, 16), Qt.AlignCenter, 
-                        f"{self.pet_data.exp}/{self.pet_data.exp_to_next}")
+    def enter(self, state):
+        """进入一个临时状态，BEHAVIOR_INTERVAL_MS 后重新选择行为"""
+        self.set_state(state)
+        self.after(BEHAVIOR_INTERVAL_MS, 'roll', self.roll)
+        
+    def roll(self):
+        """按当前心情选择行为：心情不好时停在对应状态，否则随机活动"""
+        if self.host.being_dragged:
+            self.after(BEHAVIOR_INTERVAL_MS, 'roll', self.roll)
+            return
+        if self.mood in MOOD_STATES:
+            state, effect = MOOD_STATES[self.mood]
+            if effect:
+                setattr(self.host, effect, True)
+            self.cancel('roll')
+            self.set_state(state)
+            return
+        choices = BEHAVIOR_CHOICES.get(self.mood, BEHAVIOR_CHOICES['default'])
+        self.enter(self.rng.choice(choices))
+        
+    def resume(self):
+        """忙完之后：省电空闲中就去睡觉，心情不好立即表现出来，否则先发呆再随机活动"""
+        if self.sleepy:
+            self.cancel('roll')
+            self.set_state('sleep')
+        elif self.mood in MOOD_STATES:
+            self.roll()
+        else:
+            self.enter('idle')
+            
+    def update_mood(self, mood):
+        """心情变了立即反应，忙的时候等忙完再说"""
+        if mood == self.mood:
+            return
+        self.mood = mood
+        if self.host.state not in BUSY_STATES:
+            self.roll()
+            
+    def start_action(self, action):
+        state, duration, effect_on, effect_off = ACTION_STATES[action]
+        if effect_on:
+            setattr(self.host, effect_on, True)
+        if effect_off:
+            setattr(self.host, effect_off, False)
+        self.cancel('roll')
+        self.set_state(state)
+        self.after(duration, 'finish', self.finish_action)
         
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.drag_pos = event.globalPos() - self.frameGeometry().topLeft()
+    def finish_action(self):
+        for _, _, effect, _ in ACTION_STATES.values():
+            if effect:
+                setattr(self.host, effect, False)
+        self.resume()
+        self.host.action_finished()
+        
+    def sleep(self):
+        """忙的时候先记下，等 finish_action 里 resume 时再睡"""
+        self.sleepy = True
+        if self.host.state not in BUSY_STATES:
+            self.cancel('roll')
+            self.set_state('sleep')
             
-    def mouseMoveEvent(self, event):
-        if event.buttons() == Qt.LeftButton and self.drag_pos:
-            self.move(event.globalPos() - self.drag_pos)
+    def wake(self):
+        self.sleepy = False
+        if self.host.state == 'sleep':
+            self.resume()
 
 
 class SpongeBobPet(QWidget):
     """海绵宝宝宠物 - 带完整交互"""
     
     action_done = pyqtSignal(str)  # 动作完成信号
+    first_painted = pyqtSignal()    # 第一次绘制完成
     
-    def __init__(self, pet_data):
+    def __init__(self, pet_data, scheduler, max_particles=PARTICLE_BUDGET, pose_cache=None):
         super().__init__()
         self.pet_data = pet_data
+        self.scheduler = scheduler
+        self.max_particles = max_particles
+        self.pose_cache = pose_cache or PoseCache()
         self.initUI()
         self.init_behavior()
         
@@ -229,20 +1888,25 @@ class SpongeBobPet(QWidget):
         self.setFixedSize(140, 160)
         
         screen = QDesktopWidget().screenGeometry()
+        self.screen_left = screen.left()
         self.screen_width = screen.width()
         self.screen_height = screen.height()
-        self.move(screen.width() // 2, screen.height() - 200)
+        self.place(screen.width() // 2, screen.height() - 200)
+        self.window_moves = 0
         
         # 动画状态
         self.state = 'idle'
         self.frame = 0
         self.direction = 1
-        self.jump_height = 0
-        self.jump_velocity = 0
+        self.jump_height = 0.0
+        self.jump_velocity = 0.0
         self.is_jumping = False
         
         # 特效
-        self.particles = []  # 粒子特效
+        self.particles = ParticlePool(self.max_particles)  # 粒子特效
+        self.heart_font = paint_cache.font("Arial", 14)
+        self.food_font = paint_cache.font("Arial", 16)
+        self.particle_color = QColor()
         self.show_bubble = False
         self.show_hearts = False
         self.show_food = False
@@ -251,268 +1915,292 @@ class SpongeBobPet(QWidget):
         self.show_water = False
         
         # 表情参数
-        self.eye_scale = 1.0
-        self.mouth_open = 0.3
-        self.arm_angle = 0
-        self.leg_offset = 0
-        self.body_squash = 1.0
+        self.reset_expression()
         
-        self.drag_pos = None
         self.being_dragged = False
+        self.context_menu = None
+        self.has_painted = False
+        
+        # 海绵孔洞布局按宠物固定，不再每帧随机
+        self.set_variant(random.Random(self.pet_data.birth_date).randrange(HOLE_VARIANTS))
+        
+    def set_variant(self, variant):
+        """孔洞布局（皮肤）"""
+        self.variant = variant
+        rng = random.Random(variant)
+        self.holes = [(hx, hy, rng.randint(5, 8)) for hx, hy in HOLE_POSITIONS]
+        
+    def reset_expression(self):
+        for name in ANIMATION_PARAMS:
+            setattr(self, name, ANIMATION_DEFAULTS[name])
+        self.anim_state = self.state
+        self.fade_from = None
+        self.fade_step = 0
+        self.landing_squash = 1.0
         
     def init_behavior(self):
-        # 动画定时器
-        self.anim_timer = QTimer(self)
-        self.anim_timer.timeout.connect(self.animate)
-        self.anim_timer.start(50)
-        
-        # 行为定时器
-        self.behavior_timer = QTimer(self)
-        self.behavior_timer.timeout.connect(self.random_behavior)
-        self.behavior_timer.start(3000)
-        
-        # 移动定时器
-        self.move_timer = QTimer(self)
-        self.move_timer.timeout.connect(self.move_pet)
-        self.move_timer.start(30)
-        
-        # 数值下降定时器（每分钟）
-        self.tick_timer = QTimer(self)
-        self.tick_timer.timeout.connect(self.pet_data.tick)
-        self.tick_timer.start(60000)
-        
-        # 特效定时器
-        self.effect_timer = QTimer(self)
-        self.effect_timer.timeout.connect(self.update_effects)
-        self.effect_timer.start(100)
-        
-    def random_behavior(self):
-        if self.being_dragged or self.state in ['eating', 'washing', 'playing']:
-            return
-            
-        mood = self.pet_data.get_mood()
-        
-        if mood == 'hungry':
-            self.state = 'hungry'
-            self.show_question = True
-        elif mood == 'dirty':
-            self.state = 'dirty'
-            self.show_dirt = True
-        elif mood == 'sad':
-            self.state = 'sad'
-        elif mood == 'happy':
-            behaviors = ['idle', 'walk', 'jump', 'dance', 'happy']
-            self.state = random.choice(behaviors)
-        else:
-            behaviors = ['idle', 'idle', 'walk', 'walk', 'idle']
-            self.state = random.choice(behaviors)
-            
-        if self.state == 'walk':
-            self.direction = random.choice([-1, 1])
-        elif self.state == 'jump' and not self.is_jumping:
+        # 各子系统挂到统一帧循环上
+        self.behavior = BehaviorMachine(self)
+        self.jobs = [
+            self.scheduler.add(50, self.animate, self, catchup=False),          # 动画
+            self.scheduler.add(0, self.step_behavior, self),                     # 行为
+            self.scheduler.add(0, self.step_motion, self),                       # 移动
+            self.scheduler.add(WINDOW_MOVE_MS, self.sync_window, self, catchup=False),  # 窗口位置
+            self.scheduler.add(60000, self.pet_data.tick),                       # 数值下降（每分钟）
+            self.scheduler.add(100, self.update_effects, self, catchup=False),  # 特效
+        ]
+        self.behavior.mood = self.pet_data.get_mood()
+        self.behavior.resume()
+        
+        # 订阅数值变化：心情交给状态机，脏和饿的外观特效直接跟着数值走
+        self.looks_dirty = self.pet_data.clean < DIRTY_BELOW
+        self.looks_hungry = self.pet_data.hunger < HUNGRY_BELOW
+        self.pet_data.mood_changed.connect(self.behavior.update_mood)
+        self.pet_data.stat_changed.connect(self.on_stat_changed)
+        
+    def step_behavior(self):
+        self.behavior.advance(self.scheduler.frame_dt)
+        
+    def step_motion(self):
+        self.move_pet(self.scheduler.frame_dt)
+        
+    def on_stat_changed(self, name, value):
+        if name == 'clean':
+            self.looks_dirty = value < DIRTY_BELOW
+        elif name == 'hunger':
+            self.looks_hungry = value < HUNGRY_BELOW
+        
+    def pick_direction(self):
+        self.direction = random.choice([-1, 1])
+        
+    def start_jump(self):
+        if not self.is_jumping:
             self.is_jumping = True
-            self.jump_velocity = -12
+            self.jump_velocity = -JUMP_SPEED
             
+    def action_finished(self):
+        self.action_done.emit('done')
+        
     def do_feed(self):
         """喂食动作"""
-        if self.pet_data.feed():
-            self.state = 'eating'
-            self.show_food = True
-            self.show_question = False
-            QTimer.singleShot(2000, self.finish_action)
-            return True
-        return False
+        return self.do_action('feed', self.pet_data.feed)
         
     def do_wash(self):
         """洗澡动作"""
-        if self.pet_data.wash():
-            self.state = 'washing'
-            self.show_water = True
-            self.show_dirt = False
-            QTimer.singleShot(2000, self.finish_action)
-            return True
-        return False
+        return self.do_action('wash', self.pet_data.wash)
         
     def do_play(self):
         """玩耍动作"""
-        if self.pet_data.play():
-            self.state = 'playing'
-            self.show_hearts = True
-            QTimer.singleShot(2000, self.finish_action)
-            return True
-        return False
+        return self.do_action('play', self.pet_data.play)
         
     def do_pet(self):
         """抚摸"""
+        if session is not None:
+            session.record_call(self, 'do_pet')
         self.pet_data.pet()
-        self.state = 'happy'
-        self.show_hearts = True
-        QTimer.singleShot(1500, self.finish_action)
-        
-    def finish_action(self):
-        """动作完成"""
-        self.state = 'idle'
-        self.show_food = False
-        self.show_water = False
-        self.show_hearts = False
-        self.action_done.emit('done')
+        self.behavior.start_action('pet')
+        
+    def do_action(self, action, apply):
+        if session is not None:
+            session.record_call(self, f'do_{action}')
+        if not apply():
+            return False
+        self.behavior.start_action(action)
+        return True
         
-    def move_pet(self):
+    def fall_asleep(self):
+        """空闲省电时睡觉"""
+        self.behavior.sleep()
+        
+    def wake_up(self):
+        self.behavior.wake()
+        
+    def place(self, x, y):
+        """直接把宠物放到 (x, y)：拖动、排列、回放还原位置时用"""
+        self.pos_x = float(x)
+        self.move(int(x), int(y))
+        
+    def move_pet(self, dt):
+        """按流逝的 dt 毫秒推进跳跃和行走，只更新浮点位置，不动窗口"""
         if self.being_dragged:
             return
-            
-        # 跳跃物理
+        # 卡顿时最多推进 MAX_CATCHUP_STEPS 帧；按当前帧间隔算，空闲降频时照常走
+        dt = min(dt, self.scheduler.frame_interval * MAX_CATCHUP_STEPS) / 1000
+        moved = False
+        
+        # 跳跃物理：匀加速的解析解，跳多高与帧率无关
         if self.is_jumping:
-            self.jump_velocity += 0.8
-            self.jump_height += self.jump_velocity
+            self.jump_height += self.jump_velocity * dt + 0.5 * GRAVITY * dt * dt
+            self.jump_velocity += GRAVITY * dt
+            moved = True
             if self.jump_height >= 0:
-                self.jump_height = 0
+                self.jump_height = 0.0
                 self.is_jumping = False
-                self.jump_velocity = 0
-                self.body_squash = 0.8
-                QTimer.singleShot(100, lambda: setattr(self, 'body_squash', 1.0))
+                self.jump_velocity = 0.0
+                self.landing_squash = 0.8
+                self.body_squash *= 0.8
+                self.behavior.after(100, 'squash', setattr, self, 'landing_squash', 1.0)
                 
         # 行走
         if self.state == 'walk' and not self.is_jumping:
-            new_x = self.x() + (3 * self.direction)
-            if new_x < 0:
-                new_x = 0
+            x = self.pos_x + WALK_SPEED * self.direction * dt
+            left = self.screen_left
+            right = left + self.screen_width - self.width()
+            if x < left:
+                x = float(left)
                 self.direction = 1
-            elif new_x > self.screen_width - 140:
-                new_x = self.screen_width - 140
+            elif x > right:
+                x = float(right)
                 self.direction = -1
-            self.move(new_x, self.y())
+            self.pos_x = x
+            moved = True
+            
+        if moved:
+            self.scheduler.request_update(self)
+            
+    def update_screen(self):
+        """行走范围换成宠物当前所在的屏幕
+
+        screen_left 和 pos_x 一样用宠物自己的坐标系：顶层窗口为全局坐标，
+        叠加模式下为舞台坐标。
+        """
+        if session is not None and session.replaying:
+            return  # 回放沿用录制时的屏幕
+        center = self.mapToGlobal(self.rect().center())
+        geometry = (QApplication.screenAt(center) or QApplication.primaryScreen()).geometry()
+        parent = self.parentWidget()
+        self.screen_left = geometry.left() if parent is None else parent.mapFromGlobal(geometry.topLeft()).x()
+        self.screen_width = geometry.width()
+        self.screen_height = geometry.height()
+        
+    def sync_window(self):
+        """限频把窗口挪到浮点位置；两次之间的位移由 paintEvent 平移补上"""
+        x = round(self.pos_x)
+        if x != self.x() and not self.being_dragged:
+            self.move(x, self.y())
+            self.window_moves += 1
+            self.scheduler.request_update(self)
             
     def update_effects(self):
         """更新粒子特效"""
         # 添加新粒子
-        if self.show_hearts:
-            if random.random() < 0.3:
-                self.particles.append({
-                    'type': 'heart',
-                    'x': random.randint(30, 110),
-                    'y': 60,
-                    'vy': -2,
-                    'life': 30
-                })
-        if self.show_water:
-            if random.random() < 0.5:
-                self.particles.append({
-                    'type': 'water',
-                    'x': random.randint(20, 120),
-                    'y': 0,
-                    'vy': 3,
-                    'life': 40
-                })
-        if self.show_food:
-            if random.random() < 0.2 and len([p for p in self.particles if p['type'] == 'food']) < 3:
-                self.particles.append({
-                    'type': 'food',
-                    'x': random.randint(50, 90),
-                    'y': 40,
-                    'vy': 1,
-                    'life': 20
-                })
-                
-        # 更新粒子
-        for p in self.particles:
-            p['y'] += p['vy']
-            p['life'] -= 1
+        particles = self.particles
+        if self.show_hearts and random.random() < 0.3:
+            particles.spawn(PARTICLE_HEART, random.randint(30, 110), 60, -2, 30)
+        if self.show_water and random.random() < 0.5:
+            particles.spawn(PARTICLE_WATER, random.randint(20, 120), 0, 3, 40)
+        if self.show_food and random.random() < 0.2:
+            particles.spawn(PARTICLE_FOOD, random.randint(50, 90), 40, 1, 20)
             
-        # 移除死亡粒子
-        self.particles = [p for p in self.particles if p['life'] > 0]
+        # 更新并回收粒子
+        particles.step()
         
     def animate(self):
-        self.frame = (self.frame + 1) % 60
-        mood = self.pet_data.get_mood()
-        
-        # 根据状态更新动画
-        if self.state == 'idle':
-            self.eye_scale = 1.0 + 0.05 * math.sin(self.frame * 0.2)
-            self.mouth_open = 0.3
-            self.arm_angle = 5 * math.sin(self.frame * 0.1)
-            self.leg_offset = 0
-            
-        elif self.state == 'walk':
-            self.eye_scale = 1.0
-            self.mouth_open = 0.4
-            self.arm_angle = 20 * math.sin(self.frame * 0.4)
-            self.leg_offset = 8 * math.sin(self.frame * 0.4)
-            
-        elif self.state == 'hungry':
-            self.eye_scale = 0.8
-            self.mouth_open = 0.2
-            self.arm_angle = 0
-            # 身体微微晃动
-            self.body_squash = 1.0 + 0.02 * math.sin(self.frame * 0.3)
-            
-        elif self.state == 'dirty':
-            self.eye_scale = 0.9
-            self.mouth_open = 0.2
-            self.arm_angle = -10
-            
-        elif self.state == 'sad':
-            self.eye_scale = 0.7
-            self.mouth_open = 0.1
-            self.arm_angle = -15
-            
-        elif self.state == 'happy' or self.state == 'playing':
-            self.eye_scale = 1.2
-            self.mouth_open = 0.7
-            self.arm_angle = 30 * math.sin(self.frame * 0.5)
-            self.leg_offset = 5 * math.sin(self.frame * 0.5)
-            
-        elif self.state == 'eating':
-            self.eye_scale = 1.1
-            self.mouth_open = 0.3 + 0.4 * abs(math.sin(self.frame * 0.5))
-            self.arm_angle = 40
-            
-        elif self.state == 'washing':
-            self.eye_scale = 0.8  # 闭眼
-            self.mouth_open = 0.5
-            self.arm_angle = 20 * math.sin(self.frame * 0.3)
-            self.body_squash = 1.0 + 0.05 * math.sin(self.frame * 0.4)
+        """查表取本帧的动画参数，状态刚切换时从旧参数缓动过去"""
+        self.frame = (self.frame + 1) % ANIMATION_FRAMES
+        if self.state != self.anim_state:
+            self.anim_state = self.state
+            self.fade_from = (self.eye_scale, self.mouth_open, self.arm_angle,
+                              self.leg_offset, self.body_squash / self.landing_squash)
+            self.fade_step = 0
             
-        elif self.state == 'dance':
-            self.eye_scale = 1.1
-            self.mouth_open = 0.6
-            self.arm_angle = 50 * math.sin(self.frame * 0.4)
-            self.leg_offset = 12 * math.sin(self.frame * 0.4)
-            self.body_squash = 1.0 + 0.08 * math.sin(self.frame * 0.3)
-            
-        elif self.state == 'jump':
-            self.eye_scale = 1.3
-            self.mouth_open = 0.8
-            self.arm_angle = -40
-            
-        self.update()
+        track = compiled_tracks.get(self.state) or compiled_tracks['idle']
+        values = track[self.frame]
+        if self.fade_from is not None:
+            self.fade_step += 1
+            t = EASINGS['smooth'](self.fade_step / CROSSFADE_FRAMES)
+            values = [a + (b - a) * t for a, b in zip(self.fade_from, values)]
+            if self.fade_step >= CROSSFADE_FRAMES:
+                self.fade_from = None
+        self.eye_scale, self.mouth_open, self.arm_angle, self.leg_offset, squash = values
+        # 落地时的压扁叠加在轨道之上
+        self.body_squash = squash * self.landing_squash
+        self.scheduler.request_update(self)
+        
+    def state_poses(self, state):
+        """从默认表情开始把 state 动画播放一轮（60 帧），返回出现过的姿态"""
+        self.state = state
+        self.frame = 0
+        self.reset_expression()
+        poses = {}
+        for direction in (1, -1):
+            self.direction = direction
+            for _ in range(60):
+                self.animate()
+                poses[self.current_pose()] = None
+        return list(poses)
+        
+    def current_pose(self):
+        """把当前动画参数量化成缓存键"""
+        return Pose(
+            eye_scale=round(self.eye_scale * 20) / 20,
+            mouth_open=round(self.mouth_open * 20) / 20,
+            arm_angle=round(self.arm_angle / 2) * 2,
+            leg_offset=int(round(self.leg_offset)),
+            body_squash=round(self.body_squash * 100) / 100,
+            direction=self.direction,
+        )
+        
+    def new_layer(self, dpr):
+        pixmap = QPixmap(int(self.width() * dpr), int(self.height() * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+        return pixmap
+        
+    @traced('render')
+    def render_pose(self, key):
+        """把一个姿态栅格化成位图，烘焙图集里有的直接取"""
+        _, variant, pose, dpr = key
+        pixmap = self.pose_cache.baked(variant, pose, dpr)
+        if pixmap is not None:
+            return pixmap
+        pixmap = self.new_layer(dpr)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        if pose.direction == -1:
+            painter.translate(self.width(), 0)
+            painter.scale(-1, 1)
+        self.draw_spongebob(painter, pose)
+        painter.end()
+        return pixmap
         
+    @traced('paint')
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
-        # 跳跃偏移
-        painter.translate(0, self.jump_height)
+        # 跳跃偏移，加上窗口还没跟上的水平位移
+        painter.translate(round(self.pos_x) - self.x(), self.jump_height)
         
-        # 方向翻转
-        if self.direction == -1:
-            painter.translate(self.width(), 0)
-            painter.scale(-1, 1)
-            
         # 绘制特效（背景层）
+        painter.save()
+        self.apply_direction(painter)
         self.draw_effects_bg(painter)
+        painter.restore()
         
-        # 绘制海绵宝宝
-        self.draw_spongebob(painter)
+        # 绘制海绵宝宝：稳定状态下只是一次贴图
+        key = ('pose', self.variant, self.current_pose(), self.devicePixelRatioF())
+        painter.drawPixmap(0, 0, self.pose_cache.get(key, self.render_pose))
         
         # 绘制特效（前景层）
+        self.apply_direction(painter)
         self.draw_effects_fg(painter)
         
+        if not self.has_painted:
+            self.has_painted = True
+            self.first_painted.emit()
+        
+    def apply_direction(self, painter):
+        """方向翻转"""
+        if self.direction == -1:
+            painter.translate(self.width(), 0)
+            painter.scale(-1, 1)
+            
     def draw_effects_bg(self, painter):
         """绘制背景特效"""
         # 脏污特效
-        if self.show_dirt or self.pet_data.clean < 30:
-            painter.setBrush(QBrush(QColor(100, 80, 60, 100)))
+        if self.show_dirt or self.looks_dirty:
+            painter.setBrush(paint_cache.brush((100, 80, 60, 100)))
             painter.setPen(Qt.NoPen)
             for i in range(8):
                 x = 30 + (i * 17) % 80
@@ -522,80 +2210,167 @@ class SpongeBobPet(QWidget):
     def draw_effects_fg(self, painter):
         """绘制前景特效"""
         # 问号（饿了）
-        if self.show_question or self.pet_data.hunger < 20:
-            painter.setFont(QFont("Arial", 20, QFont.Bold))
-            painter.setPen(QColor(255, 200, 100))
+        if self.show_question or self.looks_hungry:
+            painter.setFont(paint_cache.font("Arial", 20, QFont.Bold))
+            painter.setPen(paint_cache.pen((255, 200, 100)))
             bob_y = 10 + 5 * math.sin(self.frame * 0.2)
             painter.drawText(int(55), int(bob_y), "?")
             
-        # 粒子
-        for p in self.particles:
-            if p['type'] == 'heart':
-                painter.setFont(QFont("Arial", 14))
-                painter.setPen(QColor(255, 100, 150, int(255 * p['life'] / 30)))
-                painter.drawText(int(p['x']), int(p['y']), "❤")
-            elif p['type'] == 'water':
-                painter.setBrush(QBrush(QColor(100, 200, 255, int(200 * p['life'] / 40))))
-                painter.setPen(Qt.NoPen)
-                painter.drawEllipse(int(p['x']), int(p['y']), 6, 10)
-            elif p['type'] == 'food':
-                painter.setFont(QFont("Arial", 16))
-                painter.drawText(int(p['x']), int(p['y']), "🍔")
+        # 粒子：按种类成批绘制
+        particles = self.particles
+        x, y, life = particles.x, particles.y, particles.life
+        color = self.particle_color
+        
+        hearts = particles.live[PARTICLE_HEART]
+        if hearts:
+            painter.setFont(self.heart_font)
+            color.setRgb(255, 100, 150)
+            for i in hearts:
+                color.setAlpha(int(255 * life[i] / 30))
+                painter.setPen(color)
+                painter.drawText(int(x[i]), int(y[i]), "❤")
                 
-    def draw_spongebob(self, painter):
-        """绘制海绵宝宝"""
+        drops = particles.live[PARTICLE_WATER]
+        if drops:
+            painter.setPen(Qt.NoPen)
+            color.setRgb(100, 200, 255)
+            for i in drops:
+                color.setAlpha(int(200 * life[i] / 40))
+                painter.setBrush(color)
+                painter.drawEllipse(int(x[i]), int(y[i]), 6, 10)
+                
+        food = particles.live[PARTICLE_FOOD]
+        if food:
+            painter.setFont(self.food_font)
+            painter.setPen(Qt.white)
+            for i in food:
+                painter.drawText(int(x[i]), int(y[i]), "🍔")
+                
+    def draw_spongebob(self, painter, pose):
+        """绘制海绵宝宝：四肢和脸每帧画，身体直接贴静态层"""
         cx, cy = 70, 80
         
         # 应用身体变形
         painter.save()
         painter.translate(cx, cy + 50)
-        painter.scale(1.0, self.body_squash)
+        painter.scale(1.0, pose.body_squash)
         painter.translate(-cx, -(cy + 50))
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
         
         # ===== 腿 =====
-        painter.setPen(QPen(QColor(255, 230, 100), 2))
-        painter.setBrush(QBrush(QColor(255, 240, 150)))
-        leg_l = self.leg_offset
+        painter.setPen(paint_cache.pen((255, 230, 100), 2))
+        painter.setBrush(paint_cache.brush((255, 240, 150)))
+        leg_l = pose.leg_offset
         painter.drawRect(45, 115 + leg_l, 14, 28)
         painter.drawRect(81, 115 - leg_l, 14, 28)
         
         # 鞋子
-        painter.setBrush(QBrush(QColor(30, 30, 30)))
-        painter.setPen(QPen(QColor(20, 20, 20), 1))
+        painter.setBrush(paint_cache.brush((30, 30, 30)))
+        painter.setPen(paint_cache.pen((20, 20, 20), 1))
         painter.drawEllipse(42, 138 + leg_l, 20, 14)
         painter.drawEllipse(78, 138 - leg_l, 20, 14)
         
         # 袜子
-        painter.setBrush(QBrush(Qt.white))
-        painter.setPen(QPen(QColor(200, 50, 50), 2))
+        painter.setBrush(paint_cache.brush(Qt.white))
+        painter.setPen(paint_cache.pen((200, 50, 50), 2))
         painter.drawRect(45, 130 + leg_l, 14, 10)
         painter.drawRect(81, 130 - leg_l, 14, 10)
         
         # ===== 手臂 =====
         painter.save()
         painter.translate(30, 80)
-        painter.rotate(-self.arm_angle)
-        painter.setBrush(QBrush(QColor(255, 240, 150)))
-        painter.setPen(QPen(QColor(255, 230, 100), 2))
+        painter.rotate(-pose.arm_angle)
+        painter.setBrush(paint_cache.brush((255, 240, 150)))
+        painter.setPen(paint_cache.pen((255, 230, 100), 2))
         painter.drawRect(-6, 0, 12, 32)
         painter.restore()
         
         painter.save()
         painter.translate(110, 80)
-        painter.rotate(self.arm_angle)
-        painter.setBrush(QBrush(QColor(255, 240, 150)))
-        painter.setPen(QPen(QColor(255, 230, 100), 2))
+        painter.rotate(pose.arm_angle)
+        painter.setBrush(paint_cache.brush((255, 240, 150)))
+        painter.setPen(paint_cache.pen((255, 230, 100), 2))
         painter.drawRect(-6, 0, 12, 32)
         painter.restore()
         
-        # ===== 身体 =====
-        body_gradient = QLinearGradient(35, 35, 105, 120)
-        body_gradient.setColorAt(0, QColor(255, 245, 120))
-        body_gradient.setColorAt(0.5, QColor(255, 230, 80))
-        body_gradient.setColorAt(1, QColor(240, 210, 60))
+        # ===== 身体（静态层） =====
+        painter.drawPixmap(0, 0, self.get_static_layer(painter.device().devicePixelRatioF()))
         
-        painter.setBrush(QBrush(body_gradient))
-        painter.setPen(QPen(QColor(200, 180, 50), 2))
+        # ===== 脸部 =====
+        eye_size = int(20 * pose.eye_scale)
+        
+        # 眼白
+        painter.setBrush(paint_cache.brush(Qt.white))
+        painter.setPen(paint_cache.pen((100, 100, 100), 2))
+        painter.drawEllipse(45 - eye_size//2 + 10, 50 - eye_size//2 + 5, eye_size, eye_size + 5)
+        painter.drawEllipse(75 - eye_size//2 + 10, 50 - eye_size//2 + 5, eye_size, eye_size + 5)
+        
+        # 虹膜
+        iris_size = int(11 * pose.eye_scale)
+        painter.setBrush(paint_cache.brush((100, 180, 255)))
+        painter.setPen(Qt.NoPen)
+        painter.drawEllipse(48 - iris_size//2 + 10, 55 - iris_size//2 + 5, iris_size, iris_size)
+        painter.drawEllipse(78 - iris_size//2 + 10, 55 - iris_size//2 + 5, iris_size, iris_size)
+        
+        # 瞳孔
+        pupil_size = int(5 * pose.eye_scale)
+        painter.setBrush(paint_cache.brush((20, 20, 20)))
+        painter.drawEllipse(50 - pupil_size//2 + 10, 57 - pupil_size//2 + 5, pupil_size, pupil_size)
+        painter.drawEllipse(80 - pupil_size//2 + 10, 57 - pupil_size//2 + 5, pupil_size, pupil_size)
+        
+        # 眼睛高光
+        painter.setBrush(paint_cache.brush(Qt.white))
+        painter.drawEllipse(52 + 10, 53 + 5, 4, 4)
+        painter.drawEllipse(82 + 10, 53 + 5, 4, 4)
+        
+        # 睫毛
+        painter.setPen(paint_cache.pen((50, 50, 50), 2))
+        for i in range(3):
+            angle = -30 + i * 30
+            lx = 55 + 12 * math.cos(math.radians(angle - 90))
+            ly = 52 + 12 * math.sin(math.radians(angle - 90))
+            painter.drawLine(int(lx), int(ly), int(lx + 6 * math.cos(math.radians(angle - 90))), 
+                           int(ly + 6 * math.sin(math.radians(angle - 90))))
+            lx2 = 85 + 12 * math.cos(math.radians(angle - 90))
+            painter.drawLine(int(lx2), int(ly), int(lx2 + 6 * math.cos(math.radians(angle - 90))), 
+                           int(ly + 6 * math.sin(math.radians(angle - 90))))
+        
+        # 嘴巴
+        mouth_h = int(14 * pose.mouth_open)
+        painter.setBrush(paint_cache.brush((150, 50, 50)))
+        painter.setPen(paint_cache.pen((100, 30, 30), 2))
+        painter.drawEllipse(50, 80, 40, mouth_h + 10)
+        
+        # 牙齿
+        if pose.mouth_open > 0.25:
+            painter.setBrush(paint_cache.brush(Qt.white))
+            painter.setPen(paint_cache.pen((200, 200, 200), 1))
+            tooth_h = min(12, int(mouth_h * 0.9))
+            painter.drawRect(60, 81, 10, tooth_h)
+            painter.drawRect(71, 81, 10, tooth_h)
+            painter.setPen(paint_cache.pen((150, 150, 150), 1))
+            painter.drawLine(70, 81, 70, 81 + tooth_h)
+        
+        painter.restore()
+        
+    def get_static_layer(self, dpr):
+        """静态层按孔洞布局和设备像素比缓存，同布局的宠物共用"""
+        return self.pose_cache.get(('body', self.variant, dpr), self.render_body)
+        
+    def render_body(self, key):
+        pixmap = self.new_layer(key[2])
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.draw_body(painter)
+        painter.end()
+        return pixmap
+        
+    def draw_body(self, painter):
+        """绘制不随动画变化的部分：身体、孔洞、裤子、领子、鼻子、腮红、雀斑"""
+        # ===== 身体 =====
+        painter.setBrush(paint_cache.linear_gradient(
+            35, 35, 105, 120, ((0, (255, 245, 120)), (0.5, (255, 230, 80)), (1, (240, 210, 60)))))
+        painter.setPen(paint_cache.pen((200, 180, 50), 2))
         
         body_path = QPainterPath()
         body_path.moveTo(33, 35)
@@ -610,29 +2385,24 @@ class SpongeBobPet(QWidget):
         painter.drawPath(body_path)
         
         # 海绵孔洞
-        painter.setBrush(QBrush(QColor(220, 200, 50)))
+        painter.setBrush(paint_cache.brush((220, 200, 50)))
         painter.setPen(Qt.NoPen)
-        holes = [(40, 45), (60, 40), (85, 47), (45, 62), (72, 58), (92, 65),
-                 (43, 82), (65, 78), (88, 85), (50, 100), (75, 96)]
-        for hx, hy in holes:
-            size = random.randint(5, 8)
+        for hx, hy, size in self.holes:
             painter.drawEllipse(hx, hy, size, size)
         
         # ===== 裤子 =====
-        pants_gradient = QLinearGradient(30, 95, 110, 120)
-        pants_gradient.setColorAt(0, QColor(140, 90, 60))
-        pants_gradient.setColorAt(1, QColor(100, 60, 40))
-        painter.setBrush(QBrush(pants_gradient))
-        painter.setPen(QPen(QColor(80, 50, 30), 2))
+        painter.setBrush(paint_cache.linear_gradient(
+            30, 95, 110, 120, ((0, (140, 90, 60)), (1, (100, 60, 40)))))
+        painter.setPen(paint_cache.pen((80, 50, 30), 2))
         painter.drawRect(30, 98, 80, 24)
         
         # 腰带
-        painter.setBrush(QBrush(QColor(20, 20, 20)))
+        painter.setBrush(paint_cache.brush((20, 20, 20)))
         painter.drawRect(30, 95, 80, 7)
         
         # ===== 衬衫领子 =====
-        painter.setBrush(QBrush(Qt.white))
-        painter.setPen(QPen(QColor(200, 200, 200), 1))
+        painter.setBrush(paint_cache.brush(Qt.white))
+        painter.setPen(paint_cache.pen((200, 200, 200), 1))
         collar_l = QPainterPath()
         collar_l.moveTo(48, 35)
         collar_l.lineTo(65, 35)
@@ -647,8 +2417,8 @@ class SpongeBobPet(QWidget):
         painter.drawPath(collar_r)
         
         # 领带
-        painter.setBrush(QBrush(QColor(220, 50, 50)))
-        painter.setPen(QPen(QColor(180, 30, 30), 1))
+        painter.setBrush(paint_cache.brush((220, 50, 50)))
+        painter.setPen(paint_cache.pen((180, 30, 30), 1))
         tie = QPainterPath()
         tie.moveTo(64, 37)
         tie.lineTo(76, 37)
@@ -658,83 +2428,34 @@ class SpongeBobPet(QWidget):
         tie.closeSubpath()
         painter.drawPath(tie)
         
-        # ===== 脸部 =====
-        eye_size = int(20 * self.eye_scale)
-        
-        # 眼白
-        painter.setBrush(QBrush(Qt.white))
-        painter.setPen(QPen(QColor(100, 100, 100), 2))
-        painter.drawEllipse(45 - eye_size//2 + 10, 50 - eye_size//2 + 5, eye_size, eye_size + 5)
-        painter.drawEllipse(75 - eye_size//2 + 10, 50 - eye_size//2 + 5, eye_size, eye_size + 5)
-        
-        # 虹膜
-        iris_size = int(11 * self.eye_scale)
-        painter.setBrush(QBrush(QColor(100, 180, 255)))
-        painter.setPen(Qt.NoPen)
-        painter.drawEllipse(48 - iris_size//2 + 10, 55 - iris_size//2 + 5, iris_size, iris_size)
-        painter.drawEllipse(78 - iris_size//2 + 10, 55 - iris_size//2 + 5, iris_size, iris_size)
-        
-        # 瞳孔
-        pupil_size = int(5 * self.eye_scale)
-        painter.setBrush(QBrush(QColor(20, 20, 20)))
-        painter.drawEllipse(50 - pupil_size//2 + 10, 57 - pupil_size//2 + 5, pupil_size, pupil_size)
-        painter.drawEllipse(80 - pupil_size//2 + 10, 57 - pupil_size//2 + 5, pupil_size, pupil_size)
-        
-        # 眼睛高光
-        painter.setBrush(QBrush(Qt.white))
-        painter.drawEllipse(52 + 10, 53 + 5, 4, 4)
-        painter.drawEllipse(82 + 10, 53 + 5, 4, 4)
-        
-        # 睫毛
-        painter.setPen(QPen(QColor(50, 50, 50), 2))
-        for i in range(3):
-            angle = -30 + i * 30
-            lx = 55 + 12 * math.cos(math.radians(angle - 90))
-            ly = 52 + 12 * math.sin(math.radians(angle - 90))
-            painter.drawLine(int(lx), int(ly), int(lx + 6 * math.cos(math.radians(angle - 90))), 
-                           int(ly + 6 * math.sin(math.radians(angle - 90))))
-            lx2 = 85 + 12 * math.cos(math.radians(angle - 90))
-            painter.drawLine(int(lx2), int(ly), int(lx2 + 6 * math.cos(math.radians(angle - 90))), 
-                           int(ly + 6 * math.sin(math.radians(angle - 90))))
-        
         # 鼻子
-        painter.setBrush(QBrush(QColor(255, 230, 100)))
-        painter.setPen(QPen(QColor(200, 180, 50), 1))
+        painter.setBrush(paint_cache.brush((255, 230, 100)))
+        painter.setPen(paint_cache.pen((200, 180, 50), 1))
         painter.drawEllipse(65, 65, 12, 14)
         
         # 腮红
-        painter.setBrush(QBrush(QColor(255, 180, 180, 150)))
+        painter.setBrush(paint_cache.brush((255, 180, 180, 150)))
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(38, 72, 14, 8)
         painter.drawEllipse(88, 72, 14, 8)
         
-        # 嘴巴
-        mouth_h = int(14 * self.mouth_open)
-        painter.setBrush(QBrush(QColor(150, 50, 50)))
-        painter.setPen(QPen(QColor(100, 30, 30), 2))
-        painter.drawEllipse(50, 80, 40, mouth_h + 10)
-        
-        # 牙齿
-        if self.mouth_open > 0.25:
-            painter.setBrush(QBrush(Qt.white))
-            painter.setPen(QPen(QColor(200, 200, 200), 1))
-            tooth_h = min(12, int(mouth_h * 0.9))
-            painter.drawRect(60, 81, 10, tooth_h)
-            painter.drawRect(71, 81, 10, tooth_h)
-            painter.setPen(QPen(QColor(150, 150, 150), 1))
-            painter.drawLine(70, 81, 70, 81 + tooth_h)
-        
         # 雀斑
-        painter.setBrush(QBrush(QColor(220, 180, 50)))
+        painter.setBrush(paint_cache.brush((220, 180, 50)))
         painter.setPen(Qt.NoPen)
         freckles = [(40, 68), (44, 74), (38, 78), (96, 68), (100, 74), (94, 78)]
         for fx, fy in freckles:
             painter.drawEllipse(fx, fy, 4, 4)
             
-        painter.restore()
-        
     def contextMenuEvent(self, event):
-        """右键菜单"""
+        """右键菜单：第一次打开时创建，之后只更新数值"""
+        if self.context_menu is None:
+            self.build_context_menu()
+        self.feed_action.setText(f"🍔 喂食 (饱腹: {int(self.pet_data.hunger)})")
+        self.wash_action.setText(f"🛁 洗澡 (清洁: {int(self.pet_data.clean)})")
+        self.play_action.setText(f"🎮 玩耍 (快乐: {int(self.pet_data.happiness)})")
+        self.context_menu.exec_(event.globalPos())
+        
+    def build_context_menu(self):
         menu = QMenu(self)
         menu.setStyleSheet("""
             QMenu {
@@ -753,51 +2474,57 @@ class SpongeBobPet(QWidget):
             }
         """)
         
-        feed_action = QAction(f"🍔 喂食 (饱腹: {int(self.pet_data.hunger)})", self)
-        feed_action.triggered.connect(self.do_feed)
-        menu.addAction(feed_action)
+        self.feed_action = QAction("🍔 喂食", self)
+        self.feed_action.triggered.connect(self.do_feed)
+        menu.addAction(self.feed_action)
         
-        wash_action = QAction(f"🛁 洗澡 (清洁: {int(self.pet_data.clean)})", self)
-        wash_action.triggered.connect(self.do_wash)
-        menu.addAction(wash_action)
+        self.wash_action = QAction("🛁 洗澡", self)
+        self.wash_action.triggered.connect(self.do_wash)
+        menu.addAction(self.wash_action)
         
-        play_action = QAction(f"🎮 玩耍 (快乐: {int(self.pet_data.happiness)})", self)
-        play_action.triggered.connect(self.do_play)
-        menu.addAction(play_action)
+        self.play_action = QAction("🎮 玩耍", self)
+        self.play_action.triggered.connect(self.do_play)
+        menu.addAction(self.play_action)
         
         pet_action = QAction("💕 摸摸头", self)
         pet_action.triggered.connect(self.do_pet)
         menu.addAction(pet_action)
         
-        menu.exec_(event.globalPos())
+        self.context_menu = menu
         
     def mousePressEvent(self, event):
+        # 拖动本身由 DragController 处理
         if event.button() == Qt.LeftButton:
-            self.drag_pos = event.globalPos() - self.frameGeometry().topLeft()
             self.being_dragged = True
-            self.state = 'happy'
-            
-    def mouseMoveEvent(self, event):
-        if event.buttons() == Qt.LeftButton and self.drag_pos:
-            self.move(event.globalPos() - self.drag_pos)
+            self.behavior.enter('happy')
             
     def mouseReleaseEvent(self, event):
         self.being_dragged = False
-        self.drag_pos = None
+        self.update_screen()
         
     def mouseDoubleClickEvent(self, event):
         if not self.is_jumping:
-            self.state = 'jump'
-            self.is_jumping = True
-            self.jump_velocity = -12
+            self.behavior.enter('jump')
 
 
 class DesktopClock(QWidget):
-    """桌面时钟"""
-    def __init__(self):
+    """桌面时钟
+
+    lite=True 时为省电模式：背景和光晕预渲染成位图，时间文字只在整秒
+    翻页时重新排版，光晕用 glow_frames 帧循环播放（0 为关闭光晕）。
+    """
+    def __init__(self, scheduler, lite=False, glow_frames=CLOCK_GLOW_FRAMES):
         super().__init__()
-        self.initUI()
+        self.scheduler = scheduler
+        self.lite = lite
+        self.glow_frames = glow_frames
         self.glow_phase = 0
+        self.glow_index = 0
+        self.frame_cache = []
+        self.text_layer = None
+        self.next_second = 0
+        self.theme_generation = paint_cache.generation
+        self.initUI()
         
     def initUI(self):
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
@@ -807,100 +2534,436 @@ class DesktopClock(QWidget):
         screen = QDesktopWidget().screenGeometry()
         self.move(screen.width() - 300, 30)
         
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_display)
-        self.timer.start(50)
-        
-        self.drag_pos = None
-        
+        self.jobs = []
+        if self.lite:
+            # 光晕帧：一个呼吸周期与普通模式相同
+            if self.glow_frames > 0:
+                self.jobs.append(self.scheduler.add(int(GLOW_PERIOD_MS / self.glow_frames),
+                                                    self.next_glow_frame, self, catchup=False))
+            
+            # 文字每秒重排一次，到期时间对齐墙钟整秒，两次翻页之间帧循环可以一直睡
+            self.second_job = self.scheduler.add(1000, self.on_second, self, catchup=False)
+            self.jobs.append(self.second_job)
+            self.on_second()
+        else:
+            self.jobs.append(self.scheduler.add(50, self.update_display, self, catchup=False))
+            
     def update_display(self):
         self.glow_phase = (self.glow_phase + 0.05) % (2 * math.pi)
-        self.update()
+        self.scheduler.request_update(self)
+        
+    def next_glow_frame(self):
+        self.glow_index = (self.glow_index + 1) % self.glow_frames
+        self.scheduler.request_update(self)
+        
+    def on_second(self):
+        """整秒翻页：重排文字，并把下一次翻页对齐到下一个整秒"""
+        t = session_time()
+        if 0 < self.next_second - t < 0.1:
+            t = self.next_second  # 定时器略微提前醒来，按即将到来的整秒显示
+        now = datetime.fromtimestamp(t)
+        self.text_layer = self.render_layer(lambda painter: self.draw_text(painter, now))
+        self.next_second = math.floor(t) + 1
+        self.second_job.acc = max(0, 1000 - int((self.next_second - session_time()) * 1000))
+        self.scheduler.request_update(self)
+        
+    def render_layer(self, draw):
+        """把一层内容画到透明位图上"""
+        dpr = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * dpr), int(self.height() * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        draw(painter)
+        painter.end()
+        return pixmap
         
+    def get_frame(self, index):
+        """背景+光晕帧，首次使用时预渲染全部帧"""
+        if not self.frame_cache:
+            if self.glow_frames > 0:
+                phases = [2 * math.pi * i / self.glow_frames for i in range(self.glow_frames)]
+            else:
+                phases = [0]
+            for phase in phases:
+                glow = int(30 + 15 * math.sin(phase))
+                self.frame_cache.append(self.render_layer(lambda painter: self.draw_frame(painter, glow)))
+        return self.frame_cache[index % len(self.frame_cache)]
+        
+    @traced('paint')
     def paintEvent(self, event):
         painter = QPainter(self)
+        
+        if self.lite:
+            if self.theme_generation != paint_cache.generation:
+                self.theme_generation = paint_cache.generation
+                self.frame_cache = []
+                self.on_second()
+            painter.drawPixmap(0, 0, self.get_frame(self.glow_index))
+            painter.drawPixmap(0, 0, self.text_layer)
+            return
+            
         painter.setRenderHint(QPainter.Antialiasing)
         painter.setRenderHint(QPainter.TextAntialiasing)
+        self.draw_frame(painter, int(30 + 15 * math.sin(self.glow_phase)))
+        self.draw_text(painter, datetime.fromtimestamp(session_time()))
         
+    def draw_frame(self, painter, glow):
+        """绘制光晕和背景"""
         # 发光效果
-        glow = int(30 + 15 * math.sin(self.glow_phase))
         for i in range(3):
-            painter.setPen(QPen(QColor(255, 220, 100, glow - i * 10), 3 - i))
+            painter.setPen(paint_cache.pen(('clock_glow', glow - i * 10), 3 - i))
             painter.setBrush(Qt.NoBrush)
             painter.drawRoundedRect(i * 2, i * 2, self.width() - i * 4, self.height() - i * 4, 20, 20)
         
         # 背景
-        gradient = QLinearGradient(0, 0, 0, self.height())
-        gradient.setColorAt(0, QColor(40, 45, 80, 230))
-        gradient.setColorAt(1, QColor(20, 25, 50, 250))
-        
         path = QPainterPath()
         path.addRoundedRect(0, 0, self.width(), self.height(), 18, 18)
-        painter.fillPath(path, gradient)
+        painter.fillPath(path, paint_cache.linear_gradient(
+            0, 0, 0, self.height(), ((0, 'clock_top'), (1, 'clock_bottom'))))
         
+    def draw_text(self, painter, now):
+        """绘制时间和日期"""
         # 时间
-        now = datetime.now()
-        
-        font = QFont("Consolas", 38, QFont.Bold)
-        painter.setFont(font)
-        
-        text_gradient = QLinearGradient(0, 10, 0, 55)
-        text_gradient.setColorAt(0, QColor(255, 230, 150))
-        text_gradient.setColorAt(1, QColor(255, 180, 80))
-        
-        painter.setPen(QPen(QBrush(text_gradient), 1))
+        painter.setFont(paint_cache.font("Consolas", 38, QFont.Bold))
+        painter.setPen(paint_cache.gradient_pen(0, 10, 0, 55, ((0, 'time_top'), (1, 'time_bottom'))))
         painter.drawText(QRect(0, 5, self.width(), 55), Qt.AlignCenter, now.strftime("%H:%M:%S"))
         
         # 日期
         weekdays = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
         date_str = f"{now.month}月{now.day}日 {weekdays[now.weekday()]}"
         
-        painter.setFont(QFont("Microsoft YaHei", 12))
-        painter.setPen(QColor(180, 200, 255, 200))
+        painter.setFont(paint_cache.font("Microsoft YaHei", 12))
+        painter.setPen(paint_cache.pen('date'))
         painter.drawText(QRect(0, 60, self.width(), 30), Qt.AlignCenter, date_str)
+
+
+class FrameHud(QWidget):
+    """帧时间浮窗：最近的帧间隔、任务耗时和绘制耗时、拖动合并掉的移动事件，以及耗时柱状图"""
+    def __init__(self, scheduler, tracer, dragger=None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.tracer = tracer
+        self.dragger = dragger
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setFixedSize(180, 104)
+        self.move(20, 20)
+        self.job = scheduler.add(250, self.refresh, self, catchup=False)
         
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.drag_pos = event.globalPos() - self.frameGeometry().topLeft()
+    def refresh(self):
+        self.scheduler.request_update(self)
+        
+    @traced('paint')
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), paint_cache.color((0, 0, 0, 160)))
+        frames = list(self.tracer.frames)
+        if not frames:
+            return
+        dts = [frame[0] for frame in frames]
+        work = [frame[1] + frame[2] for frame in frames]
+        
+        painter.setFont(paint_cache.font("Consolas", 8))
+        painter.setPen(paint_cache.pen((255, 255, 255)))
+        painter.drawText(6, 14, f"帧间隔 {sum(dts) / len(dts):5.1f} ms  最大 {max(dts)} ms")
+        painter.drawText(6, 28, f"任务 {sum(f[1] for f in frames) / len(frames):5.2f} ms  "
+                                f"绘制 {sum(f[2] for f in frames) / len(frames):5.2f} ms")
+        if self.dragger is not None:
+            drag = self.dragger.stats()
+            painter.drawText(6, 42, f"拖动 移动 {drag['moves']} 次  合并 {drag['dropped']} 个事件")
+        
+        # 每帧耗时柱状图，底部 50 像素对应 10 ms
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(paint_cache.brush((120, 220, 120)))
+        bar_w = self.width() / len(work)
+        for i, ms in enumerate(work):
+            h = min(50, int(ms * 5))
+            painter.drawRect(int(i * bar_w), self.height() - h, max(1, int(bar_w)), h)
+
+
+class OverlayStage(QWidget):
+    """单窗口叠加模式的舞台
+
+    时钟、宠物和状态面板变成这个铺满整个虚拟桌面（所有显示器）的透明窗口
+    的子控件，共用一个后备存储和一个合成器表面；各组件仍各自绘制、拖动和
+    处理点击。窗口遮罩正好是可见组件的并集，其余区域点击会穿透到桌面。
+    组件移动、显示或隐藏后才在下一帧检查一次遮罩，同一帧的变化合并成一次，
+    所以走动的宠物按挪窗的 WINDOW_MOVE_MS 节奏重设；并集没变时不重设。
+    """
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+        self.layers = []
+        self.mask_job = None
+        self.mask_region = QRegion()
+        self.mask_updates = 0
+        
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        screen = QApplication.primaryScreen()
+        self.setGeometry(screen.virtualGeometry())
+        screen.virtualGeometryChanged.connect(self.fit_desktop)
+        
+    def add_layer(self, widget, below=False):
+        """把顶层窗口收编为舞台上的一层，后加的在上面，below=True 时放到最下层"""
+        visible = widget.isVisible()
+        widget.setParent(self)
+        self.shift_layer(widget, -self.pos())
+        if below:
+            widget.lower()
+        widget.setVisible(visible)
+        widget.installEventFilter(self)
+        self.layers.append(widget)
+        self.schedule_mask()
+        
+    def shift_layer(self, widget, shift):
+        """舞台坐标系变了：把一层平移 shift，保持它在屏幕上的位置；宠物的浮点位置和行走范围一起换算"""
+        widget.move(widget.pos() + shift)
+        if isinstance(widget, SpongeBobPet):
+            widget.pos_x += shift.x()
+            widget.screen_left += shift.x()
             
-    def mouseMoveEvent(self, event):
-        if event.buttons() == Qt.LeftButton and self.drag_pos:
-            self.move(event.globalPos() - self.drag_pos)
+    def fit_desktop(self, rect):
+        """显示器增减或重新排列后重新铺满虚拟桌面"""
+        shift = self.pos() - rect.topLeft()
+        self.setGeometry(rect)
+        for widget in self.layers:
+            self.shift_layer(widget, shift)
+        self.schedule_mask()
+        
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Move, QEvent.Resize, QEvent.Show, QEvent.Hide):
+            self.schedule_mask()
+        return False
+        
+    def schedule_mask(self):
+        """组件几何变了：下一帧检查一次遮罩"""
+        if self.mask_job is None:
+            self.mask_job = self.scheduler.add(0, self.sync_mask, self)
+        
+    def show_layer(self, widget, visible):
+        """显示/隐藏一层，舞台本身随之显示"""
+        widget.setVisible(visible)
+        if visible and not self.isVisible():
+            self.show()
+        self.sync_mask()
+        
+    def sync_mask(self):
+        if self.mask_job is not None:
+            self.scheduler.remove(self.mask_job)
+            self.mask_job = None
+        region = QRegion()
+        for widget in self.layers:
+            if widget.isVisibleTo(self):
+                region += QRegion(widget.geometry())
+        if region.isEmpty():
+            # 空遮罩等于没有遮罩，整个舞台会挡住桌面，所以直接隐藏
+            self.mask_region = QRegion()
+            self.hide()
+            return
+        if region == self.mask_region:
+            return
+        self.mask_region = region
+        self.mask_updates += 1
+        self.setMask(region)
 
 
 class PetClockApp:
-    """主应用"""
-    def __init__(self):
+    """主应用
+
+    启动时只创建数据、帧循环和宠物并立即显示；时钟、托盘等在第一帧画完后
+    再创建，状态面板、菜单和开机自启后端都在第一次用到时才创建。
+    """
+    def __init__(self, options=None):
+        self.options = options or parse_args([])
+        
+        # 录制/回放：回放时换成录制时的选项，在离屏平台上运行
+        global session
+        if self.options.record or self.options.replay:
+            session = SessionLog(self.options.replay or self.options.record,
+                                 replaying=bool(self.options.replay))
+            if self.options.seed is not None and not session.replaying:
+                session.seed = self.options.seed
+            session.apply_options(self.options)
+            if session.replaying:
+                os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+                self.prepare_replay_saves()
+        if session is not None:
+            random.seed(session.seed)
+        elif self.options.seed is not None:
+            random.seed(self.options.seed)
+            
         self.app = QApplication(sys.argv)
         self.app.setQuitOnLastWindowClosed(False)
         
-        # 创建数据
-        self.pet_data = PetData()
-        
-        # 创建组件
-        self.clock = DesktopClock()
-        self.pet = SpongeBobPet(self.pet_data)
-        self.status = StatusPanel(self.pet_data)
+        # 创建数据：每只宠物一个存档，共用一个后台存档线程
+        self.saver = SaveWorker(self.options.save_interval)
+        self.pets_data = [PetData(save_slot_path(i), self.saver,
+                                  "海绵宝宝" if i == 0 else f"海绵宝宝 {i + 1}",
+                                  StatHistory(history_path(save_slot_path(i))))
+                          for i in range(max(1, self.options.pets))]
+        self.pet_data = self.pets_data[0]
+        
+        # 统一帧循环和共用的渲染缓存
+        self.scheduler = FrameScheduler()
+        self.pose_cache = PoseCache()
+        
+        # 帧时序记录
+        if self.options.trace or self.options.hud:
+            global frame_tracer
+            frame_tracer = FrameTracer()
+        
+        # 宠物先创建、先显示
+        self.pets = [SpongeBobPet(data, self.scheduler, self.options.max_particles, self.pose_cache)
+                     for data in self.pets_data]
+        self.pet = self.pets[0]
+        self.arrange_pets()
+        
+        # 拖动：各组件共用，每帧最多移动一次窗口
+        self.dragger = DragController(self.scheduler)
+        for pet in self.pets:
+            self.dragger.attach(pet, pet.place)
+        if session is not None:
+            self.attach_session()
+        self.pet.first_painted.connect(self.on_first_frame, Qt.QueuedConnection)
+        
+        # 单窗口叠加模式：所有组件画在同一个透明窗口上
+        self.stage = None
+        if self.options.overlay:
+            self.stage = OverlayStage(self.scheduler)
+            for pet in self.pets:
+                self.stage.add_layer(pet)
+                
+        self.clock = None
+        self.status = None
+        self.tray = None
+        self.hud = None
+        
+        # 自动省电：隐藏时暂停渲染，长时间无操作降帧
+        self.power = PowerManager(self.scheduler, self.pets, self.options.idle_minutes)
+        self.app.installEventFilter(self.power)
+        if session is not None:
+            session.register('power', self.power)
+        
+        self.scheduler.start()
+        self.set_pets_visible(True)
+        startup_times['app_created'] = time.perf_counter()
+        
+    def prepare_replay_saves(self):
+        """回放时把录制开始时的存档快照写到临时目录，不动真实存档"""
+        import tempfile
+        global SAVE_FILE
+        self.replay_dir = tempfile.TemporaryDirectory(prefix='spongebob-replay-')
+        SAVE_FILE = os.path.join(self.replay_dir.name, 'pet_data.sav')
+        for i, snapshot in enumerate(session.pets):
+            write_save(save_slot_path(i), snapshot['data'])
+            
+    def attach_session(self):
+        """登记可回放的对象；录制时记下每只宠物的初始状态，回放时还原位置"""
+        session.register('app', self)
+        for i, pet in enumerate(self.pets):
+            session.register(f'pet{i}', pet)
+        if session.replaying:
+            for pet, snapshot in zip(self.pets, session.pets):
+                pet.screen_width, pet.screen_height = snapshot['screen']
+                pet.screen_left = snapshot.get('left', 0)
+                pet.place(*snapshot['pos'])
+            session.on_finished = self.finish_replay
+            self.replay_started = time.perf_counter()
+        else:
+            session.pets = [{'data': pet.pet_data.to_dict(), 'pos': [pet.pos_x, pet.y()],
+                             'screen': [pet.screen_width, pet.screen_height], 'left': pet.screen_left}
+                            for pet in self.pets]
+            self.app.installEventFilter(session)
+            
+    def finish_replay(self):
+        wall = time.perf_counter() - self.replay_started
+        recorded = session.elapsed_ms / 1000
+        print(f"回放完成：{session.frame} 帧，录制时长 {recorded:.1f} 秒，"
+              f"回放用时 {wall:.2f} 秒（{recorded / max(wall, 1e-6):.1f}×）")
+        self.quit_app()
+        
+    def load_sprites(self):
+        """挂上烘焙图集，返回缺失或已过期的 [(皮肤, 设备像素比)]"""
+        if self.options.no_sprite_atlas:
+            return []
+        fingerprint = sprite_fingerprint()
+        missing = []
+        for variant, dpr in sorted({(pet.variant, pet.devicePixelRatioF()) for pet in self.pets}):
+            atlas = SpriteAtlas.open(sprite_atlas_path(variant, dpr), fingerprint)
+            if atlas:
+                self.pose_cache.add_atlas(atlas)
+            else:
+                missing.append((variant, dpr))
+        return missing
         
-        # 连接信号
-        self.pet.action_done.connect(self.on_action_done)
+    def on_sprites_baked(self, path):
+        atlas = SpriteAtlas.open(path, sprite_fingerprint())
+        if atlas:
+            self.pose_cache.add_atlas(atlas)
         
-        # 状态更新定时器
-        self.status_timer = QTimer()
-        self.status_timer.timeout.connect(self.status.update)
-        self.status_timer.start(1000)
+    def on_first_frame(self):
+        """第一帧画完后再创建其余组件"""
+        if self.clock is not None:
+            return
+        startup_times['first_frame'] = time.perf_counter()
+        
+        self.clock = DesktopClock(self.scheduler, lite=self.options.lite_clock,
+                                  glow_frames=self.options.clock_glow_frames)
+        if self.stage:
+            self.stage.add_layer(self.clock, below=True)
+        if session is not None:
+            session.register('clock', self.clock)
+        self.dragger.attach(self.clock)
+        self.set_visible(self.clock, True)
+        self.set_visible(self.get_status(), True)
+        
+        if self.options.hud:
+            self.hud = FrameHud(self.scheduler, frame_tracer, self.dragger)
+            self.hud.show()
+        
+        # 绘制资源分配统计
+        if self.options.paint_stats:
+            self.scheduler.add(0, paint_cache.end_frame)
         
         # 创建托盘
         self.create_tray()
         
-        # 显示
-        self.clock.show()
-        self.pet.show()
-        self.status.show()
-        
-    def on_action_done(self, msg):
-        self.status.update()
-        
+        # 挂上烘焙图集；首次启动或绘制代码改过后，在后台重新烘焙。
+        # 回放只用现有的图集，不让烘焙进程和被测的回放抢 CPU
+        missing = self.load_sprites()
+        if missing and not (session is not None and session.replaying):
+            self.baker = SpriteBaker()
+            self.baker.baked.connect(self.on_sprites_baked)
+            self.baker.start(missing)
+        startup_times['ready'] = time.perf_counter()
+        
+    def get_status(self):
+        """状态面板在第一次用到时创建"""
+        if self.status is None:
+            self.status = StatusPanel(self.pet_data, self.scheduler)
+            if self.stage:
+                self.stage.add_layer(self.status, below=True)
+            if session is not None:
+                session.register('status', self.status)
+            self.dragger.attach(self.status)
+        return self.status
+        
+    def arrange_pets(self):
+        """多只宠物沿屏幕底部依次排开"""
+        pet = self.pets[0]
+        span = max(1, pet.screen_width - pet.width())
+        for i, pet in enumerate(self.pets[1:], 1):
+            pet.place((pet.x() + i * 150) % span, pet.y())
+            
+    def for_all_pets(self, method):
+        for pet in self.pets:
+            getattr(pet, method)()
+            
     def create_tray(self):
         self.tray = QSystemTrayIcon()
         
@@ -936,46 +2999,64 @@ class PetClockApp:
         painter.end()
         
         self.tray.setIcon(QIcon(pixmap))
+        self.update_tooltip()
+        self.pet_data.leveled_up.connect(self.update_tooltip)
+        
+        # 菜单第一次弹出前才填充
+        self.tray_menu = QMenu()
+        self.tray_menu.aboutToShow.connect(self.build_tray_menu)
+        self.tray.setContextMenu(self.tray_menu)
+        self.tray.activated.connect(self.tray_activated)
+        self.tray.show()
+        
+        # 有存档损坏（已改用上一份快照或新建）时提醒一下
+        errors = [error for data in self.pets_data for error in data.load_errors]
+        if errors:
+            self.tray.showMessage("🧽 海绵宝宝", "以下存档无法读取，已跳过：\n" + "\n".join(errors),
+                                  QSystemTrayIcon.Warning, 5000)
+        
+    def update_tooltip(self, *args):
         self.tray.setToolTip(f"🧽 {self.pet_data.name} Lv.{self.pet_data.level}")
         
-        # 菜单
-        menu = QMenu()
+    def build_tray_menu(self):
+        menu = self.tray_menu
+        menu.aboutToShow.disconnect(self.build_tray_menu)
         
         show_all = QAction("📺 显示全部", menu)
-        show_all.triggered.connect(self.show_all)
+        show_all.triggered.connect(lambda: self.command('show_all'))
         menu.addAction(show_all)
         
         hide_all = QAction("🙈 隐藏全部", menu)
-        hide_all.triggered.connect(self.hide_all)
+        hide_all.triggered.connect(lambda: self.command('hide_all'))
         menu.addAction(hide_all)
         
         menu.addSeparator()
         
         toggle_clock = QAction("⏰ 时钟", menu)
-        toggle_clock.triggered.connect(lambda: self.clock.setVisible(not self.clock.isVisible()))
+        toggle_clock.triggered.connect(lambda: self.command('toggle_clock'))
         menu.addAction(toggle_clock)
         
         toggle_pet = QAction("🧽 海绵宝宝", menu)
-        toggle_pet.triggered.connect(lambda: self.pet.setVisible(not self.pet.isVisible()))
+        toggle_pet.triggered.connect(lambda: self.command('toggle_pets'))
         menu.addAction(toggle_pet)
         
         toggle_status = QAction("📊 状态面板", menu)
-        toggle_status.triggered.connect(lambda: self.status.setVisible(not self.status.isVisible()))
+        toggle_status.triggered.connect(lambda: self.command('toggle_status'))
         menu.addAction(toggle_status)
         
         menu.addSeparator()
         
         # 快捷操作
         feed = QAction("🍔 喂食", menu)
-        feed.triggered.connect(self.pet.do_feed)
+        feed.triggered.connect(lambda: self.for_all_pets('do_feed'))
         menu.addAction(feed)
         
         wash = QAction("🛁 洗澡", menu)
-        wash.triggered.connect(self.pet.do_wash)
+        wash.triggered.connect(lambda: self.for_all_pets('do_wash'))
         menu.addAction(wash)
         
         play = QAction("🎮 玩耍", menu)
-        play.triggered.connect(self.pet.do_play)
+        play.triggered.connect(lambda: self.for_all_pets('do_play'))
         menu.addAction(play)
         
         menu.addSeparator()
@@ -983,10 +3064,7 @@ class PetClockApp:
         # 开机自启
         self.autostart_action = QAction("🚀 开机自启", menu)
         self.autostart_action.setCheckable(True)
-        try:
-            self.autostart_action.setChecked(is_autostart_enabled())
-        except:
-            pass
+        self.autostart_action.setChecked(is_autostart_enabled())
         self.autostart_action.triggered.connect(self.toggle_autostart)
         menu.addAction(self.autostart_action)
         
@@ -996,30 +3074,59 @@ class PetClockApp:
         quit_action.triggered.connect(self.quit_app)
         menu.addAction(quit_action)
         
-        self.tray.setContextMenu(menu)
-        self.tray.activated.connect(self.tray_activated)
-        self.tray.show()
-        
     def tray_activated(self, reason):
         if reason == QSystemTrayIcon.DoubleClick:
-            if self.pet.isVisible():
-                self.hide_all()
-            else:
-                self.show_all()
-                
+            self.command('hide_all' if self.pet.isVisible() else 'show_all')
+            
+    def command(self, name):
+        """托盘命令，录制时记入日志"""
+        if session is not None:
+            session.record_call(self, 'command', name)
+        getattr(self, name)()
+        
+    def toggle_clock(self):
+        self.set_visible(self.clock, not self.clock.isVisible())
+        
+    def toggle_pets(self):
+        self.set_pets_visible(not self.pet.isVisible())
+        
+    def toggle_status(self):
+        self.set_visible(self.get_status(), not self.get_status().isVisible())
+        
+    def set_visible(self, widget, visible):
+        if self.stage:
+            self.stage.show_layer(widget, visible)
+        else:
+            widget.setVisible(visible)
+            
+    def set_pets_visible(self, visible):
+        for pet in self.pets:
+            self.set_visible(pet, visible)
+            
     def show_all(self):
-        self.clock.show()
-        self.pet.show()
-        self.status.show()
+        if self.clock:
+            self.set_visible(self.clock, True)
+        self.set_pets_visible(True)
+        self.set_visible(self.get_status(), True)
         
     def hide_all(self):
-        self.clock.hide()
-        self.pet.hide()
-        self.status.hide()
+        if self.clock:
+            self.set_visible(self.clock, False)
+        self.set_pets_visible(False)
+        if self.status:
+            self.set_visible(self.status, False)
         
     def quit_app(self):
-        self.pet_data.save()
-        self.tray.hide()
+        for data in self.pets_data:
+            data.save()
+            data.history.close()
+        self.saver.flush()
+        if self.options.trace:
+            frame_tracer.save(self.options.trace)
+        if session is not None and not session.replaying:
+            session.save()
+        if self.tray:
+            self.tray.hide()
         self.app.quit()
         
     def toggle_autostart(self):
@@ -1036,40 +3143,164 @@ class PetClockApp:
         return self.app.exec_()
 
 
-if __name__ == '__main__':
-    app = PetClockApp()
-    sys.exit(app.run())
+# ===== 开机自启功能 =====
+class WindowsAutostart:
+    """写注册表 HKCU\\...\\Run"""
+    RUN_KEY = r"Software\Microsoft\Windows\CurrentVersion\Run"
+    VALUE_NAME = "SpongeBobPet"
+    
+    def __init__(self):
+        import winreg
+        self.winreg = winreg
+        
+    def command(self):
+        if getattr(sys, 'frozen', False):
+            return sys.executable
+        return f'pythonw "{os.path.abspath(__file__)}"'
+        
+    def is_enabled(self):
+        winreg = self.winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_READ)
+            winreg.QueryValueEx(key, self.VALUE_NAME)
+            winreg.CloseKey(key)
+            return True
+        except OSError:
+            return False
+            
+    def set_enabled(self, enable):
+        winreg = self.winreg
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_SET_VALUE)
+        if enable:
+            winreg.SetValueEx(key, self.VALUE_NAME, 0, winreg.REG_SZ, self.command())
+        else:
+            try:
+                winreg.DeleteValue(key, self.VALUE_NAME)
+            except OSError:
+                pass
+        winreg.CloseKey(key)
 
 
-# ===== 开机自启功能 =====
-import winreg
-import sys
+class XdgAutostart:
+    """Linux 桌面：在 $XDG_CONFIG_HOME/autostart 下放一个 .desktop 文件"""
+    FILE_NAME = 'spongebob-pet.desktop'
+    
+    def __init__(self):
+        config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+        self.path = os.path.join(config_home, 'autostart', self.FILE_NAME)
+        
+    def command(self):
+        if getattr(sys, 'frozen', False):
+            return f'"{sys.executable}"'
+        return f'"{sys.executable}" "{os.path.abspath(__file__)}"'
+        
+    def is_enabled(self):
+        return os.path.exists(self.path)
+        
+    def set_enabled(self, enable):
+        if enable:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write("[Desktop Entry]\n"
+                        "Type=Application\n"
+                        "Name=海绵宝宝电子宠物\n"
+                        f"Exec={self.command()}\n"
+                        "X-GNOME-Autostart-enabled=true\n")
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# sys.platform 前缀 -> 开机自启后端，可以注册新平台
+AUTOSTART_BACKENDS = {
+    'win32': WindowsAutostart,
+    'linux': XdgAutostart,
+}
+autostart_backend = None
+
+
+def get_autostart_backend():
+    """第一次用到时按平台创建后端，不支持的平台返回 None"""
+    global autostart_backend
+    if autostart_backend is None:
+        for prefix, backend in AUTOSTART_BACKENDS.items():
+            if sys.platform.startswith(prefix):
+                autostart_backend = backend()
+                break
+    return autostart_backend
+
 
 def is_autostart_enabled():
     """检查是否已设置开机自启"""
-    try:
-        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                            r"Software\Microsoft\Windows\CurrentVersion\Run", 
-                            0, winreg.KEY_READ)
-        winreg.QueryValueEx(key, "SpongeBobPet")
-        winreg.CloseKey(key)
-        return True
-    except:
-        return False
+    backend = get_autostart_backend()
+    return backend is not None and backend.is_enabled()
+
 
 def set_autostart(enable=True):
     """设置/取消开机自启"""
-    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                        r"Software\Microsoft\Windows\CurrentVersion\Run",
-                        0, winreg.KEY_SET_VALUE)
-    if enable:
-        # 获取当前脚本路径
-        app_path = sys.executable if getattr(sys, 'frozen', False) else f'pythonw "{os.path.abspath(__file__)}"'
-        winreg.SetValueEx(key, "SpongeBobPet", 0, winreg.REG_SZ, app_path)
-    else:
-        try:
-            winreg.DeleteValue(key, "SpongeBobPet")
-        except:
-            pass
-    winreg.CloseKey(key)
+    backend = get_autostart_backend()
+    if backend is None:
+        raise OSError(f"暂不支持在 {sys.platform} 上设置开机自启")
+    backend.set_enabled(enable)
     return enable
+
+
+def parse_args(argv=None):
+    """命令行选项"""
+    parser = argparse.ArgumentParser(description="海绵宝宝电子宠物")
+    parser.add_argument('--pets', type=int, default=1,
+                        help="同时养几只海绵宝宝，每只有独立存档")
+    parser.add_argument('--overlay', action='store_true',
+                        help="单窗口叠加模式：时钟、宠物和状态面板共用一个透明窗口")
+    parser.add_argument('--lite-clock', action='store_true',
+                        help="时钟省电模式：整秒刷新文字，光晕使用预渲染帧")
+    parser.add_argument('--clock-glow-frames', type=int, default=CLOCK_GLOW_FRAMES,
+                        help="省电模式下的光晕帧数，0 为关闭光晕")
+    parser.add_argument('--save-interval', type=float, default=SAVE_INTERVAL,
+                        help="存档合并写入的间隔（秒）")
+    parser.add_argument('--max-particles', type=int, default=PARTICLE_BUDGET,
+                        help="每只宠物同时存在的粒子上限")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="记录定时任务、绘制和存档的耗时，退出时写成 Chrome/Perfetto trace JSON")
+    parser.add_argument('--hud', action='store_true', help="显示帧时间浮窗")
+    parser.add_argument('--paint-stats', action='store_true',
+                        help="统计每帧新建的字体/画笔/画刷等绘制对象数量并定期输出")
+    parser.add_argument('--idle-minutes', type=float, default=IDLE_MINUTES,
+                        help="无操作多少分钟后降到低帧率并让宠物睡觉，0 为不启用")
+    parser.add_argument('--record', metavar='FILE',
+                        help="录制本次会话（随机种子、帧间隔、鼠标和菜单操作），退出时写入 FILE")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="在离屏平台上尽快回放录制的会话后退出，可配合 --trace 对比性能")
+    parser.add_argument('--seed', type=int, help="随机种子")
+    parser.add_argument('--no-sprite-atlas', action='store_true',
+                        help="不使用也不生成烘焙好的姿态图集")
+    parser.add_argument('--bake-sprites', type=float, nargs='*', metavar='DPR',
+                        help="为所有皮肤烘焙姿态图集后退出，默认用主屏的设备像素比")
+    options, _ = parser.parse_known_args(argv)
+    return options
+
+
+def bake_all(dprs):
+    """--bake-sprites：按皮肤 × 设备像素比烘焙图集"""
+    if not dprs:
+        app = QApplication.instance() or QApplication(sys.argv[:1])
+        dprs = [app.primaryScreen().devicePixelRatio()]
+    for dpr in dprs:
+        for variant in range(HOLE_VARIANTS):
+            start = time.perf_counter()
+            path = bake_sprites(variant, dpr)
+            print(f"{path}  {os.path.getsize(path) / 1024:.0f} KB  "
+                  f"{time.perf_counter() - start:.1f} s")
+    return 0
+
+
+startup_times['import_end'] = time.perf_counter()
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    options = parse_args()
+    if options.bake_sprites is not None:
+        sys.exit(bake_all(options.bake_sprites))
+    app = PetClockApp(options)
+    sys.exit(app.run())
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+海绵宝宝的数值规则：每分钟衰减、互动效果、升级曲线和心情阈值
+不依赖 PyQt5，pet_clock.PetData 和 pet_sim.py 共用这一份，改数值只改这里。
+"""
+
+import math
+
+# 各项数值的上限（下限为 0）
+STAT_MAX = 100
+
+# 每分钟 tick 的衰减：饱腹、清洁每次都降；脏的时候扣健康，饿的时候扣快乐
+HUNGER_DECAY = 1
+CLEAN_DECAY = 0.5
+DIRTY_HEALTH_DECAY = 0.5
+HUNGRY_HAPPINESS_DECAY = 1
+
+# 心情阈值，按 mood_of 的判断顺序
+HUNGRY_BELOW = 20
+DIRTY_BELOW = 30
+SICK_BELOW = 30
+HAPPY_ABOVE = 80
+SAD_BELOW = 30
+
+# 互动效果：动作 -> ({数值: 变化量}, 经验)；饱腹不超过 PLAY_MIN_HUNGER 时不能玩耍
+ACTION_EFFECTS = {
+    'feed': ({'hunger': 30, 'happiness': 10}, 10),
+    'wash': ({'clean': 40, 'health': 10}, 10),
+    'play': ({'happiness': 25, 'hunger': -10}, 15),
+    'pet': ({'happiness': 15}, 5),
+}
+PLAY_MIN_HUNGER = 20
+
+# 升级曲线：1 级升 2 级所需经验，之后每级乘 EXP_GROWTH 取整
+FIRST_LEVEL_EXP = 100
+EXP_GROWTH = 1.2
+
+
+def clamp_stat(value):
+    return min(STAT_MAX, max(0, value))
+
+
+def decay_stats(hunger, clean, health, happiness, minutes, floor=math.floor, maximum=max):
+    """闭式计算连续 minutes 次 tick 之后的数值，耗时与分钟数无关
+
+    第 k 次 tick 后 clean = c0 - CLEAN_DECAY·k，从 clean < DIRTY_BELOW 的第一次
+    tick 起每次扣健康；hunger 同理，从 hunger < HUNGRY_BELOW 起每次扣快乐。
+    pet_sim 传入 numpy.floor / numpy.maximum，对整群宠物的数组一次算完。
+    """
+    if minutes <= 0:
+        return hunger, clean, health, happiness
+    # 第一次满足阈值条件的 tick 序号（从 1 开始）
+    first_dirty = maximum(1, floor((clean - DIRTY_BELOW) / CLEAN_DECAY) + 1)
+    first_hungry = maximum(1, floor((hunger - HUNGRY_BELOW) / HUNGER_DECAY) + 1)
+    dirty_ticks = maximum(0, minutes - first_dirty + 1)
+    hungry_ticks = maximum(0, minutes - first_hungry + 1)
+    return (maximum(0, hunger - HUNGER_DECAY * minutes),
+            maximum(0, clean - CLEAN_DECAY * minutes),
+            maximum(0, health - DIRTY_HEALTH_DECAY * dirty_ticks),
+            maximum(0, happiness - HUNGRY_HAPPINESS_DECAY * hungry_ticks))
+
+
+def mood_of(hunger, clean, health, happiness):
+    if hunger < HUNGRY_BELOW:
+        return 'hungry'
+    if clean < DIRTY_BELOW:
+        return 'dirty'
+    if health < SICK_BELOW:
+        return 'sick'
+    if happiness > HAPPY_ABOVE:
+        return 'happy'
+    if happiness < SAD_BELOW:
+        return 'sad'
+    return 'normal'